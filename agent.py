@@ -4,144 +4,584 @@ from __future__ import annotations
 
 QuestionAgent responsibilities:
 - Ask Gemini to generate Q&A grouped by difficulty levels: basic, intermediate, expert
-- Validate/clean the JSON response
+- Validate/clean the JSON response, or stream pairs as they are generated
+- Serve repeat requests from an optional generation cache, and near-duplicate
+  requests from a similar stored record (similarity.py)
 - Persist via provided save callback
+
+The model itself sits behind a backend (backends.py: Gemini, or a local fake for
+load tests). AgentFactory is the app-scoped entry point: it owns one backend (and
+thus one HTTP connection pool) shared by every agent and Flask worker thread, and one
+ModelCallScheduler (scheduler.py) that paces, retries and circuit-breaks model calls.
+Prompts, response parsing, error mapping and the result shape are module functions,
+shared with the coroutine agent of the ASGI app (asgi.py).
 """
 
+import asyncio
 import json
-from typing import List, Tuple, Dict
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import List, Tuple, Dict, Iterator
 
+from backends import GeminiBackend, ModelResponse, build_backend
+from cache import make_cache_key
 from config import settings
-from google import genai
-from google.genai import types as genai_types
+from hedging import DEADLINES, Hedger, remaining
+from jsonstream import LEVELS, IncrementalQAParser, extract_json
+from metrics import REGISTRY
+from scheduler import PRIORITY_INTERACTIVE, ModelCallScheduler, SchedulerError
+from tracing import bind, span
+
+
+# Bump whenever the prompt changes so cached generations are not reused across prompts
+PROMPT_VERSION = "1"
+# The same for the per-level prompts (GENERATION_MODE=per_level)
+LEVEL_PROMPT_VERSION = "1"
+
+# The hedger raises TimeoutError, asyncio.wait_for asyncio.TimeoutError (distinct before 3.11)
+_TIMEOUTS = (TimeoutError, asyncio.TimeoutError)
+
+
+# Where /agent time goes: prompt_build, model_call (one HTTP attempt, after queueing),
+# parse (JSON cleanup + normalization) and db_insert (timed by the save callbacks)
+STAGE_SECONDS = REGISTRY.histogram("agent_stage_seconds", "Time spent per generation stage", ("stage",))
+TOKENS = REGISTRY.counter("gemini_tokens_total", "Model tokens reported by responses", ("kind",))
 
 
 class AIUnavailableError(Exception):
     pass
 
 
+class DeadlineExceededError(AIUnavailableError):
+    """The request's deadline passed before a valid generation arrived."""
+
+
+class ConcurrencyLimitError(AIUnavailableError, SchedulerError):
+    """No model-call slot freed up in time; the provider was never contacted."""
+
+
+def generation_cache_key(job_title: str, job_description: str, mode: str | None = None) -> str:
+    """Cache and single-flight key of a request generated in `mode` (default GENERATION_MODE).
+
+    The two modes use different prompts, so their generations are cached apart.
+    """
+    mode = mode or settings.generation_mode
+    version = f"per_level-{LEVEL_PROMPT_VERSION}" if mode == "per_level" else PROMPT_VERSION
+    return make_cache_key(job_title, job_description, settings.gemini_model, version)
+
+
+def build_prompt(job_title: str, job_description: str) -> str:
+    return (
+        "You are an expert interviewer and technical writer.\n"
+        "Task: Generate interview Q&A pairs tailored to the role below, grouped by difficulty level.\n"
+        "Levels: 'basic' (fundamentals), 'intermediate' (solid practical skills), 'expert' (deep, systems-level, or advanced).\n"
+        "Answers must be concise (2-4 sentences), precise, practical, and role-specific; no fluff, no markdown.\n"
+        "Output: ONLY valid JSON (no prose, no code fences).\n"
+        "Schema: {\n  \"basic\": [{\"question\": str, \"answer\": str}, ... 5-8],\n  \"intermediate\": [{...} 6-10],\n  \"expert\": [{...} 6-10]\n}\n\n"
+        f"Job Title: {job_title}\n"
+        f"Job Description: {job_description}\n"
+    )
+
+
+# Focus and size of each level in the per-level prompts (as in the combined prompt)
+_LEVEL_GUIDANCE = {
+    "basic": ("fundamentals", "5-8"),
+    "intermediate": ("solid practical skills", "6-10"),
+    "expert": ("deep, systems-level, or advanced", "6-10"),
+}
+
+
+def build_level_prompt(job_title: str, job_description: str, level: str) -> str:
+    focus, count = _LEVEL_GUIDANCE[level]
+    return (
+        "You are an expert interviewer and technical writer.\n"
+        f"Task: Generate {count} '{level}' level interview Q&A pairs ({focus}) tailored to the role below.\n"
+        "Answers must be concise (2-4 sentences), precise, practical, and role-specific; no fluff, no markdown.\n"
+        "Output: ONLY valid JSON (no prose, no code fences).\n"
+        f"Schema: {{\n  \"{level}\": [{{\"question\": str, \"answer\": str}}, ...]\n}}\n\n"
+        f"Job Title: {job_title}\n"
+        f"Job Description: {job_description}\n"
+    )
+
+
+def estimate_tokens(prompt: str) -> int:
+    """Rough token cost of a call (~4 characters per prompt token plus expected output)."""
+    return len(prompt) // 4 + settings.gemini_expected_output_tokens
+
+
+def usage_tokens(resp: ModelResponse) -> int | None:
+    return resp.total_tokens
+
+
+def count_tokens(resp: ModelResponse) -> None:
+    for kind, value in (("prompt", resp.prompt_tokens), ("output", resp.output_tokens), ("total", resp.total_tokens)):
+        if value:
+            TOKENS.inc(value, kind=kind)
+
+
+def _is_pair(x) -> bool:
+    return isinstance(x, dict) and "question" in x and "answer" in x
+
+
+def parse_text(content: str) -> Dict[str, List[Dict[str, str]]]:
+    """Clean and validate response text into the three-level dict.
+
+    Raises ValueError when the response holds no usable {question, answer} objects.
+    """
+    content = (content or "").strip()
+    try:
+        qa = json.loads(content)
+    except ValueError:
+        # Prose, code fences or trailing junk around the JSON; a bare array is "basic"
+        qa = extract_json(content)
+
+    # Normalize to dict of levels
+    levels = {"basic": [], "intermediate": [], "expert": []}
+    if isinstance(qa, dict):
+        for k in list(levels.keys()):
+            v = qa.get(k)
+            if isinstance(v, list):
+                levels[k] = [x for x in v if _is_pair(x)]
+    elif isinstance(qa, list):
+        levels["basic"] = [x for x in qa if _is_pair(x)]
+    else:
+        raise ValueError("invalid JSON shape from Gemini")
+
+    # Ensure at least one level is non-empty
+    if not any(levels.values()):
+        raise ValueError("no valid {question,answer} objects from Gemini")
+    return levels
+
+
+def parse_level(content: str, level: str) -> List[Dict[str, str]]:
+    """Pairs of one level from a per-level response (a bare array or another key is accepted)."""
+    parsed = parse_text(content)
+    return parsed[level] or next(pairs for pairs in parsed.values() if pairs)
+
+
+def parse_response(resp: ModelResponse, parse):
+    """Count the response's tokens and return `parse(resp.text)` (ValueError when invalid)."""
+    count_tokens(resp)
+    with span("response.clean"), STAGE_SECONDS.time(stage="parse"):
+        return parse(resp.text)
+
+
+def generation_error(error: Exception, deadline: float | None) -> AIUnavailableError:
+    """The AIUnavailableError to raise for a failed generation (504 once the deadline passed)."""
+    if isinstance(error, _TIMEOUTS) or (deadline is not None and time.monotonic() >= deadline):
+        DEADLINES.inc()
+        return DeadlineExceededError("Gemini generation timed out")
+    return AIUnavailableError(f"Gemini generation failed: {error}")
+
+
+def validate_posting(job_title: str, job_description: str) -> Tuple[str, str]:
+    """Stripped (job_title, job_description); raises ValueError when either is empty."""
+    job_title = (job_title or "").strip()
+    job_description = (job_description or "").strip()
+    if not job_title or not job_description:
+        raise ValueError("job_title and job_description are required")
+    return job_title, job_description
+
+
+def build_result(
+    job_title: str, job_description: str, flat_qs: List[str], qa_by_level: dict, source: str, record: dict
+) -> dict:
+    """Response shape of `QuestionAgent.run` for a saved record."""
+    return {
+        "id": record["id"],
+        "job_title": job_title,
+        "job_description": job_description,
+        "questions": flat_qs,
+        "qa": record.get("qa") or qa_by_level,
+        "created_at": record.get("created_at"),
+        "source": source,
+    }
+
+
+def flatten_questions(qa_by_level: dict | List[dict]) -> List[str]:
+    """Flatten questions across all levels for simple storage and compatibility.
+
+    Also accepts the legacy flat list of {question, answer} pairs.
+    """
+    if isinstance(qa_by_level, list):
+        qa_by_level = {"basic": qa_by_level}
+    flat_qs: List[str] = []
+    for arr in qa_by_level.values():
+        for x in arr:
+            q = (x.get("question") or "").strip()
+            if q:
+                flat_qs.append(q)
+    return flat_qs
+
+
 class QuestionAgent:
     """Encapsulates the flow: generate questions -> validate -> save (via callback)."""
 
-    def __init__(self, save_callback):
+    def __init__(
+        self,
+        save_callback,
+        cache=None,
+        backend=None,
+        limiter=None,
+        save_many_callback=None,
+        similar=None,
+        coalescer=None,
+        scheduler=None,
+        priority: int = PRIORITY_INTERACTIVE,
+        hedger=None,
+    ):
         self._save = save_callback
+        self._save_many = save_many_callback
+        self._cache = cache
+        # Optional SimilarityIndex: near-duplicate requests reuse a stored record
+        self._similar = similar
+        # Optional RequestCoalescer (singleflight.py) applied around run()
+        self._coalescer = coalescer
+        # Shared backend/limiter come from AgentFactory; standalone agents build a Gemini backend
+        self._backend = backend
+        self._limiter = limiter
+        # Optional ModelCallScheduler; lower priority values are admitted first
+        self._scheduler = scheduler
+        self._priority = priority
+        # Optional Hedger (hedging.py): backup requests for slow or failed calls
+        self._hedger = hedger
 
-    def generate_qa(self, job_title: str, job_description: str) -> Tuple[Dict[str, List[Dict[str, str]]], str]:
+    def _get_backend(self):
+        if self._backend is not None:
+            return self._backend
+        if not settings.gemini_api_key:
+            raise AIUnavailableError("Gemini API key not configured")
+        return GeminiBackend(settings.gemini_api_key)
+
+    def _call_model(self, fn, prompt: str, deadline: float | None = None):
+        """Run one model call through the scheduler (if any) and the concurrency limiter."""
+        def attempt():
+            # The limiter slot is held per attempt, not across retry backoff
+            with self._limiter or nullcontext(), span("model.call"), STAGE_SECONDS.time(stage="model_call"):
+                return fn()
+
+        if self._scheduler is None:
+            return attempt()
+        return self._scheduler.call(
+            attempt,
+            priority=self._priority,
+            estimated_tokens=estimate_tokens(prompt),
+            usage=usage_tokens,
+            deadline=deadline,
+        )
+
+    def generate_qa(
+        self, job_title: str, job_description: str, deadline: float | None = None
+    ) -> Tuple[Dict[str, List[Dict[str, str]]], str]:
         """Generate Q&A pairs in three levels using Gemini.
 
         Returns a tuple (qa_by_level, source) where qa_by_level is a dict with keys:
         {"basic": [...], "intermediate": [...], "expert": [...]} and each value is a
         list of {question, answer} objects.
-        Raises AIUnavailableError if the model is not available or response invalid.
+        deadline is a time.monotonic() value bounding queueing, retries and the HTTP
+        call; with a hedger, a slow or failed call is backed up by a second request
+        (to GEMINI_FALLBACK_MODEL when set) and the first valid response wins.
+        With GENERATION_MODE=per_level the three levels are requested concurrently
+        with level-specific prompts, each retried on its own when it fails validation.
+        Raises AIUnavailableError if the model is not available or response invalid,
+        DeadlineExceededError once the deadline has passed.
         """
-        if not settings.gemini_api_key:
-            raise AIUnavailableError("Gemini API key not configured")
-
         try:
-            client = genai.Client(api_key=settings.gemini_api_key)
-            model = settings.gemini_model
-            prompt = (
-                "You are an expert interviewer and technical writer.\n"
-                "Task: Generate interview Q&A pairs tailored to the role below, grouped by difficulty level.\n"
-                "Levels: 'basic' (fundamentals), 'intermediate' (solid practical skills), 'expert' (deep, systems-level, or advanced).\n"
-                "Answers must be concise (2-4 sentences), precise, practical, and role-specific; no fluff, no markdown.\n"
-                "Output: ONLY valid JSON (no prose, no code fences).\n"
-                "Schema: {\n  \"basic\": [{\"question\": str, \"answer\": str}, ... 5-8],\n  \"intermediate\": [{...} 6-10],\n  \"expert\": [{...} 6-10]\n}\n\n"
-                f"Job Title: {job_title}\n"
-                f"Job Description: {job_description}\n"
-            )
-            contents = [
-                genai_types.Content(role="user", parts=[genai_types.Part.from_text(text=prompt)])
-            ]
-            cfg = genai_types.GenerateContentConfig(
-                response_modalities=["TEXT"],
-                # Ask explicitly for JSON output if supported by the SDK version
-                response_mime_type="application/json",
-            )
-            resp = client.models.generate_content(model=model, contents=contents, config=cfg)
-
-            # Aggregate textual output robustly
-            text_chunks: List[str] = []
-            if getattr(resp, "text", None):
-                text_chunks.append(resp.text)
-            elif getattr(resp, "candidates", None):
-                for cand in resp.candidates:
-                    if getattr(cand, "content", None) and getattr(cand.content, "parts", None):
-                        for part in cand.content.parts:
-                            t = getattr(part, "text", None)
-                            if t:
-                                text_chunks.append(t)
-            content = "\n".join([t for t in text_chunks if t]).strip()
-
-            # Clean possible fences or prose
-            cleaned = content.strip()
-            if cleaned.startswith("```"):
-                # strip first fenced block
-                try:
-                    start = cleaned.find("\n") + 1
-                    end = cleaned.rfind("```")
-                    if end > start > 0:
-                        cleaned = cleaned[start:end].strip()
-                except Exception:
-                    pass
-
-            import json as _json, re as _re
+            backend = self._get_backend()
+            if settings.generation_mode == "per_level":
+                return self._generate_levels(backend, job_title, job_description, deadline), "gemini"
+            with STAGE_SECONDS.time(stage="prompt_build"):
+                prompt = build_prompt(job_title, job_description)
+            return self._generate_validated(backend, prompt, parse_text, deadline), "gemini"
+        except AIUnavailableError:
+            raise
+        except Exception as e:
+            raise generation_error(e, deadline)
+
+    def _generate_validated(self, backend, prompt: str, parse, deadline: float | None, retries: int = 0):
+        """One (hedged) model call whose response text is parsed by `parse`.
+
+        A ValueError from `parse` (invalid or empty JSON) is retried up to `retries` times.
+        """
+        def attempt(model: str):
+            def call():
+                resp = self._call_model(
+                    lambda: backend.generate(model, prompt, timeout=remaining(deadline)),
+                    prompt,
+                    deadline,
+                )
+                return parse_response(resp, parse)
+            # Hedged attempts run on the hedger's threads; keep them under this request's trace
+            return bind(call)
+
+        primary = attempt(settings.gemini_model)
+        backup = None
+        if self._hedger is not None:
+            backup_model = settings.gemini_fallback_model or (settings.gemini_model if self._hedger.enabled else None)
+            backup = attempt(backup_model) if backup_model else None
+        for n in range(retries + 1):
             try:
-                qa = _json.loads(cleaned)
-            except Exception:
-                # Try to extract first JSON array substring
-                # If model ignored schema and returned an array, capture it; otherwise try object
-                match_obj = _re.search(r"\{[\s\S]*\}", cleaned)
-                match_arr = _re.search(r"\[[\s\S]*\]", cleaned)
-                if match_obj:
-                    qa = _json.loads(match_obj.group(0))
-                elif match_arr:
-                    qa = {"basic": _json.loads(match_arr.group(0))}
-                else:
+                if self._hedger is None:
+                    return primary()
+                return self._hedger.run(primary, backup, deadline)
+            except ValueError:
+                if n >= retries or remaining(deadline) == 0:
                     raise
 
-            # Normalize to dict of levels
-            levels = {"basic": [], "intermediate": [], "expert": []}
-            if isinstance(qa, dict):
-                for k in list(levels.keys()):
-                    v = qa.get(k)
-                    if isinstance(v, list):
-                        levels[k] = [x for x in v if isinstance(x, dict) and "question" in x and "answer" in x]
-            elif isinstance(qa, list):
-                levels["basic"] = [x for x in qa if isinstance(x, dict) and "question" in x and "answer" in x]
-            else:
-                raise ValueError("invalid JSON shape from Gemini")
-
-            # Ensure at least one level is non-empty
-            if not any(levels.values()):
-                raise ValueError("no valid {question,answer} objects from Gemini")
-            return levels, "gemini"
+    def _generate_levels(self, backend, job_title: str, job_description: str, deadline: float | None) -> dict:
+        """Request every level concurrently; latency approaches that of the slowest level."""
+        def one(level: str) -> List[Dict[str, str]]:
+            with STAGE_SECONDS.time(stage="prompt_build"):
+                prompt = build_level_prompt(job_title, job_description, level)
+            return self._generate_validated(
+                backend, prompt, lambda text: parse_level(text, level), deadline, retries=settings.level_retries
+            )
+
+        with ThreadPoolExecutor(max_workers=len(LEVELS), thread_name_prefix="agent-level") as pool:
+            futures = {level: pool.submit(bind(one), level) for level in LEVELS}
+        # Every level must succeed so cached/saved records are never missing a level
+        return {level: future.result() for level, future in futures.items()}
+
+    def stream_qa(self, job_title: str, job_description: str) -> Iterator[Tuple[str, Dict[str, str]]]:
+        """Stream Q&A generation, yielding (level, {question, answer}) as each object completes.
+
+        Raises AIUnavailableError if the model is not available, the stream fails or it
+        ends before the document is complete.
+        """
+        try:
+            backend = self._get_backend()
+            parser = IncrementalQAParser()
+            prompt = build_prompt(job_title, job_description)
+            # Pairs may already have been yielded, so a failed stream is not retried
+            slot = (
+                self._scheduler.slot(self._priority, estimate_tokens(prompt))
+                if self._scheduler is not None else nullcontext()
+            )
+            with slot, self._limiter or nullcontext():
+                for text in backend.stream(settings.gemini_model, prompt):
+                    for level, obj in parser.feed(text):
+                        if _is_pair(obj):
+                            yield level, obj
+            if not parser.done:
+                # Cut off mid-document: the pairs so far must not be saved or cached as a full record
+                raise AIUnavailableError("Gemini generation failed: truncated JSON in model output")
         except AIUnavailableError:
             raise
         except Exception as e:
             raise AIUnavailableError(f"Gemini generation failed: {e}")
 
-    def run(self, job_title: str, job_description: str) -> dict:
-        job_title = (job_title or "").strip()
-        job_description = (job_description or "").strip()
-        if not job_title or not job_description:
-            raise ValueError("job_title and job_description are required")
-
-        qa_by_level, source = self.generate_qa(job_title, job_description)
-        # Flatten questions across all levels for simple storage and compatibility
-        flat_qs: List[str] = []
-        for arr in qa_by_level.values():
-            for x in arr:
-                q = (x.get("question") or "").strip()
-                if q:
-                    flat_qs.append(q)
-        record = self._save(job_title, job_description, flat_qs, qa_by_level)
-        return {
-            "id": record["id"],
-            "job_title": job_title,
-            "job_description": job_description,
-            "questions": flat_qs,
-            "qa": record.get("qa") or qa_by_level,
-            "created_at": record.get("created_at"),
-            "source": source,
-        }
+    def run(self, job_title: str, job_description: str, deadline: float | None = None) -> dict:
+        with span("agent.run"):
+            job_title, job_description = validate_posting(job_title, job_description)
+            if self._coalescer is None:
+                return self._run_once(job_title, job_description, deadline)
+            # Identical concurrent requests share one generation and one persisted record
+            cache_key = generation_cache_key(job_title, job_description)
+            return self._coalescer.run(
+                cache_key, lambda: self._run_once(job_title, job_description, deadline), deadline
+            )
+
+    def _run_once(self, job_title: str, job_description: str, deadline: float | None = None) -> dict:
+        qa_by_level, source, cache_key = self._generate_cached(job_title, job_description, deadline)
+        return self._persist(job_title, job_description, qa_by_level, source, cache_key)
+
+    def run_batch(self, items: List[dict], max_workers: int = 8) -> List[dict]:
+        """Generate for many postings concurrently, then persist all successes at once.
+
+        items are {job_title, job_description} dicts. Generation fans out over at most
+        max_workers threads; successful items are saved through the save_many callback
+        in a single bulk insert. Returns one entry per item, in input order: either
+        {"index", "ok": True, ...run() result...} or {"index", "ok": False, "error", "status"}.
+        """
+        def generate(item):
+            job_title, job_description = validate_posting(item.get("job_title"), item.get("job_description"))
+            qa_by_level, source, cache_key = self._generate_cached(job_title, job_description)
+            return job_title, job_description, qa_by_level, source, cache_key
+
+        def attempt(item):
+            try:
+                return generate(item), None
+            except ValueError as e:
+                return None, (str(e), 400)
+            except AIUnavailableError as e:
+                return None, (str(e), 503)
+            except Exception as e:
+                return None, (str(e), 500)
+
+        workers = max(1, min(max_workers, len(items)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="agent-batch") as pool:
+            outcomes = list(pool.map(bind(attempt), items))
+
+        generated = [(i, out) for i, (out, err) in enumerate(outcomes) if out is not None]
+        rows = [
+            {
+                "job_title": job_title,
+                "job_description": job_description,
+                "questions": flatten_questions(qa_by_level),
+                "qa": qa_by_level,
+                "cache_key": cache_key,
+            }
+            for _, (job_title, job_description, qa_by_level, _source, cache_key) in generated
+        ]
+        if self._save_many is not None:
+            records = self._save_many(rows) if rows else []
+        else:
+            records = [self._save(**row) for row in rows]
+
+        results: List[dict] = [
+            {"index": i, "ok": False, "error": err[0], "status": err[1]} if err else {}
+            for i, (_out, err) in enumerate(outcomes)
+        ]
+        for (i, (job_title, job_description, qa_by_level, source, _key)), row, record in zip(generated, rows, records):
+            self._remember(record["id"], job_title, job_description)
+            results[i] = {
+                "index": i,
+                "ok": True,
+                **build_result(job_title, job_description, row["questions"], qa_by_level, source, record),
+            }
+        return results
+
+    def run_stream(self, job_title: str, job_description: str) -> Iterator[Tuple[str, dict]]:
+        """Streaming counterpart of run().
+
+        Yields ("qa", {level, question, answer}) for every pair as soon as it is available,
+        then a single ("record", result) once the record is persisted; result has the same
+        shape as run()'s return value.
+        """
+        job_title, job_description = validate_posting(job_title, job_description)
+        # The stream always uses the single-document prompt
+        cache_key = generation_cache_key(job_title, job_description, mode="single")
+        reused = self._reuse(job_title, job_description, cache_key)
+        if reused is not None:
+            qa_by_level, source = reused
+            for level, arr in qa_by_level.items():
+                for pair in arr:
+                    yield "qa", {"level": level, "question": pair["question"], "answer": pair["answer"]}
+        else:
+            qa_by_level = {"basic": [], "intermediate": [], "expert": []}
+            for level, pair in self.stream_qa(job_title, job_description):
+                qa_by_level[level].append(pair)
+                yield "qa", {"level": level, "question": pair["question"], "answer": pair["answer"]}
+            if not any(qa_by_level.values()):
+                raise AIUnavailableError("Gemini generation failed: no valid {question,answer} objects from Gemini")
+            source = "gemini"
+            if self._cache is not None:
+                self._cache.set(cache_key, qa_by_level)
+        yield "record", self._persist(job_title, job_description, qa_by_level, source, cache_key)
+
+    def _reuse(self, job_title: str, job_description: str, cache_key: str) -> Tuple[dict, str] | None:
+        """Serve from the exact-match cache, then from a near-duplicate stored record."""
+        if self._cache is not None:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                return cached, "cache"
+        if self._similar is not None:
+            try:
+                match = self._similar.find(job_title, job_description)
+                qa = self._similar.load_qa(match[0]) if match is not None else None
+            except Exception:
+                qa = None
+            if qa and any(qa.values()):
+                return qa, "similar"
+        return None
+
+    def _remember(self, record_id: int, job_title: str, job_description: str) -> None:
+        if self._similar is not None:
+            self._similar.add(record_id, job_title, job_description)
+
+    def _generate_cached(
+        self, job_title: str, job_description: str, deadline: float | None = None
+    ) -> Tuple[dict, str, str]:
+        cache_key = generation_cache_key(job_title, job_description)
+        reused = self._reuse(job_title, job_description, cache_key)
+        if reused is not None:
+            return reused[0], reused[1], cache_key
+        qa_by_level, source = self.generate_qa(job_title, job_description, deadline)
+        if self._cache is not None:
+            self._cache.set(cache_key, qa_by_level)
+        return qa_by_level, source, cache_key
+
+    def _persist(self, job_title: str, job_description: str, qa_by_level: dict, source: str, cache_key: str) -> dict:
+        flat_qs = flatten_questions(qa_by_level)
+        record = self._save(job_title, job_description, flat_qs, qa_by_level, cache_key=cache_key)
+        self._remember(record["id"], job_title, job_description)
+        return build_result(job_title, job_description, flat_qs, qa_by_level, source, record)
+
+
+class ConcurrencyLimiter:
+    """Bounded semaphore that gives up after `timeout` seconds instead of queueing forever."""
+
+    def __init__(self, max_concurrency: int, timeout: float):
+        self._sem = threading.BoundedSemaphore(max_concurrency)
+        self._timeout = timeout
+
+    def __enter__(self):
+        if not self._sem.acquire(timeout=self._timeout if self._timeout > 0 else None):
+            raise ConcurrencyLimitError("Gemini concurrency limit reached; try again later")
+        return self
+
+    def __exit__(self, *exc):
+        self._sem.release()
+        return False
+
+
+class AgentFactory:
+    """App-scoped, thread-safe factory for QuestionAgent instances.
+
+    The model backend (and its genai.Client) is created once here and shared, so
+    keep-alive connections are reused across requests and threads. An optional limiter caps in-flight model calls,
+    and the shared scheduler keeps all agents within the per-process rate budgets.
+    The hedger (and its latency window) is shared as well.
+    """
+
+    def __init__(
+        self,
+        save_callback,
+        cache=None,
+        max_concurrency: int = 0,
+        acquire_timeout: float = 30.0,
+        save_many_callback=None,
+        similar=None,
+        coalescer=None,
+    ):
+        self._save = save_callback
+        self._save_many = save_many_callback
+        self._cache = cache
+        self._similar = similar
+        self._coalescer = coalescer
+        self.backend = build_backend(settings)
+        self.limiter = ConcurrencyLimiter(max_concurrency, acquire_timeout) if max_concurrency > 0 else None
+        self.scheduler = ModelCallScheduler.from_settings(settings)
+        self.hedger = Hedger(
+            enabled=settings.gemini_hedging,
+            default_delay=settings.gemini_hedge_delay,
+            min_delay=settings.gemini_hedge_min_delay,
+            # Every job thread and every generation of a request (a /agent/batch runs up
+            # to BATCH_CONCURRENCY), fanned out per level, may hold a primary and a backup
+            # at once; a smaller pool queues primaries until they time out. Threads are
+            # started lazily, so the bound costs nothing until it is used.
+            max_workers=(
+                settings.web_threads * max(1, settings.batch_concurrency) + settings.job_workers
+            ) * len(LEVELS) * 2,
+        )
+
+    def create(self, priority: int = PRIORITY_INTERACTIVE) -> QuestionAgent:
+        return QuestionAgent(
+            self._save,
+            cache=self._cache,
+            backend=self.backend,
+            limiter=self.limiter,
+            save_many_callback=self._save_many,
+            similar=self._similar,
+            coalescer=self._coalescer,
+            scheduler=self.scheduler,
+            priority=priority,
+            hedger=self.hedger,
+        )
+
+    def reset_after_fork(self) -> None:
+        """Give a forked worker process its own backend; HTTP connections (and the
+        client's pool) must not be shared with the parent process."""
+        self.backend = build_backend(settings)
@@ -1,8 +1,17 @@
 """Flask application entry point and minimal HTTP API.
 
 Exposed routes:
-- POST /agent : Generate interview Q&A via Gemini and persist.
-- GET  /get   : List saved records (optionally filter by job_title).
+- POST /agent     : Generate interview Q&A via Gemini and persist (`?async=1` queues a job).
+- POST /agent/stream : Same as /agent, streamed as Server-Sent Events pair by pair.
+- POST /agent/batch  : Generate for many postings with bounded concurrency; one bulk insert.
+- GET  /jobs/<id> : Status of an async generation job, with the record once finished.
+- GET  /get       : List saved records (optionally filter by job_title; keyset pagination;
+                    `view=summary` / `fields=` column projection).
+- GET  /get/<id>  : One full record.
+- GET  /search    : Ranked full-text search over saved questions and answers.
+- GET  /get/<id>/qa/<level> : Pairs of one level (basic|intermediate|expert) from the pair table.
+- GET  /metrics   : Prometheus-style counters and stage-latency histograms for this process.
+- GET  /admin/profile : Sampling profile of all threads as collapsed stacks (needs ADMIN_TOKEN).
 
 Notes:
 - A React (Vite) frontend lives under `frontend/` and calls the API above.
@@ -10,14 +19,57 @@ Notes:
     to keep the app minimal and focused on the production flow.
 """
 
+import hmac
 import json
-from flask import Flask, request, jsonify
+import uuid
+from urllib.parse import urlencode
+
+from flask import Flask, Response, request, jsonify, stream_with_context
+from sqlalchemy import insert
 from typing import List
 
 from config import settings
-from database import init_db, get_session
-from models import InterviewQuestion
-from agent import QuestionAgent, AIUnavailableError
+from database import engine, init_db, get_session
+from models import InterviewQuestion, QAPair, GenerationJob
+from agent import STAGE_SECONDS, AgentFactory, AIUnavailableError, DeadlineExceededError
+from cache import build_cache
+from jsonstream import LEVELS
+from profiler import ProfilerBusyError, SamplingProfiler
+from records import (
+    decode_cursor,
+    derived_qa_statement,
+    encode_cursor,
+    encode_payload,
+    isoformat,
+    loads_or_none,
+    parse_fields,
+    qa_pair_rows,
+    record_json,
+    request_deadline,
+    select_columns,
+    serialize_record,
+)
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as METRICS
+from search import SearchIndex
+from similarity import SimilarityIndex
+from singleflight import RequestCoalescer
+from jobs import JobRunner
+from scheduler import PRIORITY_BACKGROUND
+from tracing import Tracer, bind_iter, span
+
+
+GET_ROWS = METRICS.histogram(
+    "get_rows_returned", "Rows returned per GET /get page", buckets=(0, 1, 5, 10, 25, 50, 100, 200)
+)
+
+
+def _json_response(body: str, status: int = 200) -> Response:
+    return Response(body, status=status, mimetype="application/json")
+
+
+def _sse(event: str, payload: dict) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
 
 
 def create_app() -> Flask:
@@ -28,87 +80,366 @@ def create_app() -> Flask:
                         Returns a JSON payload with placeholder interview questions.
     """
     app = Flask(__name__)
+    # Per-request span trees for slow-request logs / OTLP export (no-op unless configured)
+    tracer = Tracer.from_settings(settings)
+    tracer.install(app)
+    app.extensions["tracer"] = tracer
+
+    # Shared across requests so repeat postings skip the model call
+    cache = build_cache(settings)
+    similar = None
+    if settings.similarity_threshold > 0:
+        similar = SimilarityIndex(settings.similarity_threshold, max_entries=settings.similarity_max_entries)
+        similar.start()
+    app.extensions["similarity_index"] = similar
 
     # Minimal API: only /agent and /get are exposed for the frontend
 
     # Helper for agent to persist and return compact result
-    def _save_record(job_title: str, job_description: str, questions: List[str], qa: dict | List[dict] | None = None) -> dict:
+    def _save_record(
+        job_title: str,
+        job_description: str,
+        questions: List[str],
+        qa: dict | List[dict] | None = None,
+        cache_key: str | None = None,
+    ) -> dict:
         """Persist a record and return minimal info for response assembly.
 
         questions is a list of strings. qa can be either a list of {q,a} pairs or
-        a dict keyed by levels {basic, intermediate, expert}. They are serialized as JSON
-        for storage and de-serialized on reads.
+        a dict keyed by levels {basic, intermediate, expert}. They are validated and
+        serialized as JSON once here, so reads can splice the stored text verbatim.
+        cache_key tags the row so the database cache backend can find it again.
         """
-        questions_json = json.dumps(questions, ensure_ascii=False)
-        qa_json = json.dumps(qa, ensure_ascii=False) if qa is not None else None
-        with get_session() as session:
+        questions_json, qa_json = encode_payload(questions, qa)
+        with STAGE_SECONDS.time(stage="db_insert"), get_session() as session:
             rec = InterviewQuestion(
                 job_title=job_title,
                 job_description=job_description,
                 questions=questions_json,
                 qa=qa_json,
+                cache_key=cache_key,
             )
             session.add(rec)
             session.flush()
+            pair_rows = qa_pair_rows(rec.id, qa)
+            if pair_rows:
+                session.execute(insert(QAPair), pair_rows)
             return {
                 "id": rec.id,
                 "created_at": rec.created_at.isoformat() if getattr(rec, "created_at", None) else None,
                 "qa": qa,
             }
 
+    def _save_records(rows: List[dict]) -> List[dict]:
+        """Persist many records with one executemany INSERT in one transaction.
+
+        rows are dicts with the keyword arguments of `_save_record`. Returns the same
+        minimal info as `_save_record`, in input order.
+        """
+        # MySQL has no INSERT ... RETURNING: the new ids are read back by a key shared by the batch
+        batch_id = uuid.uuid4().hex
+        values = []
+        for row in rows:
+            questions_json, qa_json = encode_payload(row["questions"], row.get("qa"))
+            values.append({
+                "job_title": row["job_title"],
+                "job_description": row["job_description"],
+                "questions": questions_json,
+                "qa": qa_json,
+                "cache_key": row.get("cache_key"),
+                "batch_id": batch_id,
+            })
+        with STAGE_SECONDS.time(stage="db_insert"), get_session() as session:
+            session.execute(insert(InterviewQuestion), values)
+            # Auto-increment ids follow row order within the batch's statement(s)
+            saved = (
+                session.query(InterviewQuestion.id, InterviewQuestion.created_at)
+                .filter(InterviewQuestion.batch_id == batch_id)
+                .order_by(InterviewQuestion.id)
+                .all()
+            )
+            pair_rows = [p for (rec_id, _), row in zip(saved, rows) for p in qa_pair_rows(rec_id, row.get("qa"))]
+            if pair_rows:
+                session.execute(insert(QAPair), pair_rows)
+            return [
+                {"id": rec_id, "created_at": isoformat(created_at), "qa": row.get("qa")}
+                for (rec_id, created_at), row in zip(saved, rows)
+            ]
+
+    def _load_result(record_id: int) -> dict | None:
+        """A stored record in the shape returned by `QuestionAgent.run`."""
+        with get_session() as session:
+            rec = session.get(InterviewQuestion, record_id)
+            return serialize_record(rec) if rec is not None else None
+
+    coalescer = None
+    if settings.singleflight in ("process", "database"):
+        coalescer = RequestCoalescer(_load_result, use_database=settings.singleflight == "database")
+
+    # One shared genai.Client/connection pool for all requests and worker threads
+    agents = AgentFactory(
+        save_callback=_save_record,
+        cache=cache,
+        max_concurrency=settings.gemini_max_concurrency,
+        acquire_timeout=settings.gemini_acquire_timeout,
+        save_many_callback=_save_records,
+        similar=similar,
+        coalescer=coalescer,
+    )
+    app.extensions["agent_factory"] = agents
+
+    search_index = SearchIndex(engine)
+
+    # Background pool for POST /agent?async=1; job state is stored in the DB
+    jobs = JobRunner(agents, max_workers=settings.job_workers)
+    app.extensions["job_runner"] = jobs
+
     @app.route("/agent", methods=["POST"])
     def agent_run():
+        with span("request.parse"):
+            data = request.get_json(silent=True) or {}
+            job_title = (data.get("job_title") or "").strip()
+            job_description = (data.get("job_description") or "").strip()
+        if not job_title or not job_description:
+            return jsonify({"error": "'job_title' and 'job_description' are required."}), 400
+
+        if request.args.get("async", "").lower() in ("1", "true", "yes"):
+            job_id = jobs.submit(job_title, job_description)
+            status_url = f"/jobs/{job_id}"
+            return jsonify({"job_id": job_id, "status": "pending", "status_url": status_url}), 202, {"Location": status_url}
+
+        try:
+            deadline = request_deadline(request.headers.get("X-Request-Timeout"), request.args.get("timeout"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        agent = agents.create()
+        try:
+            result = agent.run(job_title, job_description, deadline=deadline)
+            with span("response.serialize"):
+                return jsonify(result), 201
+        except DeadlineExceededError as e:
+            return jsonify({"error": str(e)}), 504
+        except AIUnavailableError as e:
+            return jsonify({"error": str(e)}), 503
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    @app.route("/agent/stream", methods=["POST"])
+    def agent_stream():
+        """Stream generation as SSE: one `qa` event per pair, then `done` with the record id.
+
+        Failures after the stream has started are reported as an `error` event.
+        """
         data = request.get_json(silent=True) or {}
         job_title = (data.get("job_title") or "").strip()
         job_description = (data.get("job_description") or "").strip()
         if not job_title or not job_description:
             return jsonify({"error": "'job_title' and 'job_description' are required."}), 400
 
-        agent = QuestionAgent(save_callback=_save_record)
+        agent = agents.create()
+
+        def events():
+            try:
+                for kind, payload in agent.run_stream(job_title, job_description):
+                    if kind == "qa":
+                        yield _sse("qa", payload)
+                    else:
+                        yield _sse("done", {
+                            "id": payload["id"],
+                            "created_at": payload["created_at"],
+                            "source": payload["source"],
+                        })
+            except AIUnavailableError as e:
+                yield _sse("error", {"error": str(e), "status": 503})
+            except Exception as e:
+                yield _sse("error", {"error": str(e), "status": 500})
+
+        return Response(
+            stream_with_context(bind_iter(events())),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.route("/agent/batch", methods=["POST"])
+    def agent_batch():
+        """Generate for a list of postings; reports per-item success or failure.
+
+        Body: {"items": [{job_title, job_description}, ...]} (a bare list is also accepted).
+        Returns 201 when every item succeeded, 207 when some or all failed.
+        """
+        data = request.get_json(silent=True)
+        items = data.get("items") if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "'items' must be a non-empty list."}), 400
+        if len(items) > settings.batch_max_items:
+            return jsonify({"error": f"at most {settings.batch_max_items} items per batch."}), 400
+        items = [item if isinstance(item, dict) else {} for item in items]
+
+        # Bulk work yields to single interactive requests under the rate budget
+        agent = agents.create(priority=PRIORITY_BACKGROUND)
         try:
-            result = agent.run(job_title, job_description)
-            return jsonify(result), 201
-        except AIUnavailableError as e:
-            return jsonify({"error": str(e)}), 503
+            results = agent.run_batch(items, max_workers=settings.batch_concurrency)
         except Exception as e:
             return jsonify({"error": str(e)}), 500
+        succeeded = sum(1 for r in results if r["ok"])
+        body = {"results": results, "succeeded": succeeded, "failed": len(results) - succeeded}
+        return jsonify(body), 201 if succeeded == len(results) else 207
+
+    @app.route("/jobs/<job_id>", methods=["GET"])
+    def job_status(job_id: str):
+        with get_session() as session:
+            job = session.get(GenerationJob, job_id)
+            if job is None:
+                return jsonify({"error": "job not found"}), 404
+            record = None
+            if job.record_id is not None:
+                rec = session.get(InterviewQuestion, job.record_id)
+                record = serialize_record(rec) if rec is not None else None
+            return jsonify({
+                "job_id": job.id,
+                "status": job.status,
+                "error": job.error,
+                "record": record,
+                "created_at": isoformat(job.created_at),
+                "updated_at": isoformat(job.updated_at),
+            })
 
     # Note: manual /save endpoint was removed as the frontend persists via /agent
 
     @app.route("/get", methods=["GET"])
     def get_saved():
-        # Optional filters: job_title
+        """List records newest first.
+
+        Optional filters: job_title. Projection: `view=summary` (id, job_title,
+        created_at) or `fields=a,b,...`; only those columns are read from SQL. Keyset pagination: pass `cursor` (from the
+        X-Next-Cursor header of the previous page) or `before_id`; deep pages cost the
+        same as the first because they seek on the primary key instead of using OFFSET.
+        """
         job_title = request.args.get("job_title")
-        limit = min(int(request.args.get("limit", 50)), 200)
+        try:
+            fields = parse_fields(request.args.get("view"), request.args.get("fields"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        try:
+            limit = max(1, min(int(request.args.get("limit", 50)), 200))
+            before_id = decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+            if before_id is None and request.args.get("before_id"):
+                before_id = int(request.args["before_id"])
+        except ValueError:
+            return jsonify({"error": "invalid 'limit', 'cursor' or 'before_id'."}), 400
 
         with get_session() as session:
-            query = session.query(InterviewQuestion)
+            # Select only the requested columns; heavy text columns stay in the DB
+            query = session.query(*select_columns(fields))
             if job_title:
                 query = query.filter(InterviewQuestion.job_title == job_title)
-            rows = query.order_by(InterviewQuestion.id.desc()).limit(limit).all()
-
-            items = []
-            for r in rows:
-                try:
-                    q_list = json.loads(r.questions)
-                except Exception:
-                    q_list = []
-                qa_list = None
-                if r.qa:
-                    try:
-                        qa_list = json.loads(r.qa)
-                    except Exception:
-                        qa_list = None
-                items.append({
-                    "id": r.id,
-                    "job_title": r.job_title,
-                    "job_description": r.job_description,
-                    "questions": q_list,
-                    "qa": qa_list,
-                    "created_at": r.created_at.isoformat() if getattr(r, "created_at", None) else None,
-                })
-
-            return jsonify(items)
+            if before_id is not None:
+                query = query.filter(InterviewQuestion.id < before_id)
+            # Fetch one extra row to learn whether another page exists
+            rows = query.order_by(InterviewQuestion.id.desc()).limit(limit + 1).all()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            GET_ROWS.observe(len(rows))
+            derived = derived_qa_statement(rows, fields)
+            derived_qa = dict(session.execute(derived).all()) if derived is not None else None
+
+            with span("response.serialize", rows=len(rows)):
+                resp = _json_response("[" + ",".join(record_json(r, fields, derived_qa) for r in rows) + "]")
+            if has_more:
+                cursor = encode_cursor(rows[-1].id)
+                args = {k: v for k, v in request.args.items() if k not in ("cursor", "before_id")}
+                args["cursor"] = cursor
+                resp.headers["X-Next-Cursor"] = cursor
+                resp.headers["Link"] = f'<{request.path}?{urlencode(args)}>; rel="next"'
+            return resp
+
+    @app.route("/get/<int:record_id>", methods=["GET"])
+    def get_one(record_id: int):
+        """Return one full record (used by summary listings to load details on demand)."""
+        with get_session() as session:
+            rec = session.get(InterviewQuestion, record_id)
+            if rec is None:
+                return jsonify({"error": "record not found"}), 404
+            return _json_response(record_json(rec))
+
+    @app.route("/search", methods=["GET"])
+    def search():
+        """Ranked full-text search over saved questions and answers.
+
+        Params: q (required), limit (default 20, max 100), level (optional filter).
+        """
+        q = (request.args.get("q") or "").strip()
+        level = request.args.get("level") or None
+        if not q:
+            return jsonify({"error": "'q' is required."}), 400
+        if level is not None and level not in LEVELS:
+            return jsonify({"error": f"level must be one of: {', '.join(LEVELS)}"}), 400
+        try:
+            limit = max(1, min(int(request.args.get("limit", 20)), 100))
+        except ValueError:
+            return jsonify({"error": "invalid 'limit'."}), 400
+        with get_session() as session:
+            results = search_index.search(session, q, limit=limit, level=level)
+        return jsonify({"query": q, "results": results})
+
+    @app.route("/get/<int:record_id>/qa/<level>", methods=["GET"])
+    def get_level(record_id: int, level: str):
+        """Return the pairs of one level, read from `interview_qa_pairs` only."""
+        if level not in LEVELS:
+            return jsonify({"error": f"level must be one of: {', '.join(LEVELS)}"}), 400
+        with get_session() as session:
+            pairs = (
+                session.query(QAPair.question, QAPair.answer)
+                .filter(QAPair.record_id == record_id, QAPair.level == level)
+                .order_by(QAPair.position)
+                .all()
+            )
+            if pairs:
+                return jsonify([{"question": p.question, "answer": p.answer} for p in pairs])
+            # No pair rows: the level is empty, or the record predates the table and
+            # has not been backfilled yet (python manage.py backfill-qa-pairs)
+            row = session.query(InterviewQuestion.qa).filter(InterviewQuestion.id == record_id).first()
+            if row is None:
+                return jsonify({"error": "record not found"}), 404
+            legacy = qa_pair_rows(record_id, loads_or_none(row.qa))
+            return jsonify([{"question": p["question"], "answer": p["answer"]} for p in legacy if p["level"] == level])
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(METRICS.render(), content_type=METRICS_CONTENT_TYPE)
+
+    profiler = SamplingProfiler()
+
+    @app.route("/admin/profile", methods=["GET"])
+    def admin_profile():
+        """Sample every thread for `seconds` (default 10) and return collapsed stacks.
+
+        Requires `Authorization: Bearer <ADMIN_TOKEN>`; answers 404 when ADMIN_TOKEN is
+        unset and 409 while another profile is running. `interval_ms` sets the sampling
+        period (default 10).
+        """
+        if not settings.admin_token:
+            return jsonify({"error": "not found"}), 404
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(supplied.encode(), settings.admin_token.encode()):
+            return jsonify({"error": "unauthorized"}), 401, {"WWW-Authenticate": "Bearer"}
+        try:
+            seconds = float(request.args.get("seconds", 10))
+            interval = float(request.args.get("interval_ms", 10)) / 1000
+            if not seconds > 0 or not interval > 0:
+                raise ValueError
+        except ValueError:
+            return jsonify({"error": "'seconds' and 'interval_ms' must be positive numbers."}), 400
+        try:
+            result = profiler.run(seconds, interval)
+        except ProfilerBusyError as e:
+            return jsonify({"error": str(e)}), 409
+        return Response(result["collapsed"], mimetype="text/plain", headers={
+            "Content-Disposition": 'attachment; filename="profile.folded"',
+            "X-Profile-Samples": str(result["samples"]),
+            "X-Profile-Seconds": str(result["seconds"]),
+        })
 
     return app
 
@@ -0,0 +1,418 @@
+"""ASGI variant of the API (Starlette), for many concurrent in-flight generations.
+
+Same contract as the Flask app for:
+- POST /agent    : Generate interview Q&A and persist (201, 400, 503, 504 on deadline).
+- GET  /get      : List saved records (job_title filter, keyset pagination, projection).
+- GET  /get/<id> : One full record.
+- GET  /metrics  : Prometheus-style metrics for this process.
+
+A request waiting on Gemini is a suspended coroutine instead of a blocked OS
+thread: the model is called through the genai SDK's async client
+(`client.aio.models.generate_content`) and the database through SQLAlchemy's
+async engine (aiosqlite / aiomysql). One process can therefore keep thousands of
+generations in flight; GEMINI_MAX_CONCURRENCY and the rate budgets still apply.
+
+Prompts, JSON cleanup/normalization, request validation and the response shape
+come from agent.py and records.py, so both apps generate and store identical
+records. Not available here: /agent/stream, /agent/batch, ?async=1 jobs,
+/search, near-duplicate reuse, hedged backup requests (GEMINI_FALLBACK_MODEL is
+still used after a failure) and request tracing. Identical concurrent requests
+are coalesced within the process only.
+
+Run:
+    python asgi.py [--bind 0.0.0.0:5000] [--workers 1]
+    uvicorn asgi:app    # after `python manage.py init-db`
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+from typing import Dict, List, Tuple
+from urllib.parse import urlencode
+
+from sqlalchemy import insert, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from agent import (
+    STAGE_SECONDS,
+    AIUnavailableError,
+    ConcurrencyLimitError,
+    DeadlineExceededError,
+    build_level_prompt,
+    build_prompt,
+    build_result,
+    estimate_tokens,
+    flatten_questions,
+    generation_cache_key,
+    generation_error,
+    parse_level,
+    parse_response,
+    parse_text,
+    usage_tokens,
+    validate_posting,
+)
+from backends import build_backend
+from cache import CACHE_REQUESTS, DatabaseCacheBackend, build_cache
+from config import settings
+from database import POOL_OPTIONS
+from hedging import FALLBACKS, remaining
+from jsonstream import LEVELS
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as METRICS
+from models import InterviewQuestion, QAPair
+from records import (
+    decode_cursor,
+    derived_qa_statement,
+    encode_cursor,
+    encode_payload,
+    isoformat,
+    parse_fields,
+    qa_pair_rows,
+    record_json,
+    request_deadline,
+    select_columns,
+)
+from scheduler import PRIORITY_INTERACTIVE, ModelCallScheduler
+
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "mysql": "mysql+aiomysql"}
+
+
+def async_database_url(url: str) -> str:
+    """The async-driver form of a sync DATABASE_URL (sqlite -> aiosqlite, mysql -> aiomysql)."""
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"no async driver known for {parsed.drivername}; set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+class AsyncConcurrencyLimiter:
+    """`ConcurrencyLimiter` for coroutines: waiters sleep on the event loop."""
+
+    def __init__(self, max_concurrency: int, timeout: float):
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self._timeout = timeout
+
+    async def __aenter__(self):
+        try:
+            await asyncio.wait_for(self._sem.acquire(), self._timeout if self._timeout > 0 else None)
+        except asyncio.TimeoutError:
+            raise ConcurrencyLimitError("Gemini concurrency limit reached; try again later")
+        return self
+
+    async def __aexit__(self, *exc):
+        self._sem.release()
+        return False
+
+
+class AsyncQuestionAgent:
+    """Coroutine counterpart of `QuestionAgent.run` (generate -> validate -> save).
+
+    One instance serves the whole process. Validation, prompts, parsing, error
+    mapping and the result shape are the module functions QuestionAgent uses.
+    """
+
+    def __init__(
+        self,
+        sessions,
+        cache=None,
+        backend=None,
+        limiter=None,
+        scheduler=None,
+        coalesce: bool = True,
+        serialize_writes: bool = False,
+    ):
+        self._sessions = sessions
+        self._cache = cache
+        self._backend = backend
+        self._limiter = limiter
+        self._scheduler = scheduler
+        # cache_key -> task of the generation in flight, shared by identical requests
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._coalesce = coalesce
+        # SQLite has a single writer: queue inserts here instead of failing with "database is locked"
+        self._write_lock = asyncio.Lock() if serialize_writes else None
+
+    async def _call_model(self, model: str, prompt: str, deadline: float | None):
+        async def attempt():
+            async with self._limiter or contextlib.nullcontext():
+                with STAGE_SECONDS.time(stage="model_call"):
+                    return await self._backend.agenerate(model, prompt, timeout=remaining(deadline))
+
+        if self._scheduler is None:
+            return await attempt()
+        return await self._scheduler.acall(
+            attempt,
+            priority=PRIORITY_INTERACTIVE,
+            estimated_tokens=estimate_tokens(prompt),
+            usage=usage_tokens,
+            deadline=deadline,
+        )
+
+    async def _generate_validated(self, prompt: str, parse, deadline: float | None, retries: int = 0):
+        async def attempt(model: str):
+            return parse_response(await self._call_model(model, prompt, deadline), parse)
+
+        for n in range(retries + 1):
+            try:
+                try:
+                    return await attempt(settings.gemini_model)
+                except Exception:
+                    if not settings.gemini_fallback_model or remaining(deadline) == 0:
+                        raise
+                    FALLBACKS.inc()
+                    return await attempt(settings.gemini_fallback_model)
+            except ValueError:
+                if n >= retries or remaining(deadline) == 0:
+                    raise
+
+    async def _generate_levels(self, job_title: str, job_description: str, deadline: float | None) -> dict:
+        async def one(level: str) -> List[Dict[str, str]]:
+            prompt = build_level_prompt(job_title, job_description, level)
+            return await self._generate_validated(
+                prompt, lambda text: parse_level(text, level), deadline, retries=settings.level_retries
+            )
+
+        pairs = await asyncio.gather(*(one(level) for level in LEVELS))
+        return dict(zip(LEVELS, pairs))
+
+    async def generate_qa(
+        self, job_title: str, job_description: str, deadline: float | None = None
+    ) -> Tuple[Dict[str, List[Dict[str, str]]], str]:
+        """See `QuestionAgent.generate_qa`; same errors."""
+        if self._backend is None:
+            raise AIUnavailableError("Gemini API key not configured")
+        try:
+            if settings.generation_mode == "per_level":
+                work = self._generate_levels(job_title, job_description, deadline)
+            else:
+                with STAGE_SECONDS.time(stage="prompt_build"):
+                    prompt = build_prompt(job_title, job_description)
+                work = self._generate_validated(prompt, parse_text, deadline)
+            return await asyncio.wait_for(work, remaining(deadline)), "gemini"
+        except AIUnavailableError:
+            raise
+        except Exception as e:
+            raise generation_error(e, deadline)
+
+    async def _cache_get(self, key: str):
+        if self._cache is None:
+            return None
+        backend = self._cache.backend
+        if not isinstance(backend, DatabaseCacheBackend):
+            # In-memory: no I/O, safe to call on the event loop
+            return self._cache.get(key)
+        try:
+            async with self._sessions() as session:
+                value = backend.from_row((await session.execute(backend.statement(key))).first())
+        except Exception:
+            value = None
+        CACHE_REQUESTS.inc(result="miss" if value is None else "hit")
+        return value
+
+    async def _save(self, job_title: str, job_description: str, questions: List[str], qa: dict, cache_key: str) -> dict:
+        """Async `_save_record`: the record, its pair rows and the read-back of created_at."""
+        questions_json, qa_json = encode_payload(questions, qa)
+        async with self._write_lock or contextlib.nullcontext():
+            with STAGE_SECONDS.time(stage="db_insert"):
+                async with self._sessions() as session, session.begin():
+                    rec = InterviewQuestion(
+                        job_title=job_title,
+                        job_description=job_description,
+                        questions=questions_json,
+                        qa=qa_json,
+                        cache_key=cache_key,
+                    )
+                    session.add(rec)
+                    await session.flush()
+                    pair_rows = qa_pair_rows(rec.id, qa)
+                    if pair_rows:
+                        await session.execute(insert(QAPair), pair_rows)
+                    created_at = (await session.execute(
+                        select(InterviewQuestion.created_at).where(InterviewQuestion.id == rec.id)
+                    )).scalar()
+        return {"id": rec.id, "created_at": isoformat(created_at), "qa": qa}
+
+    async def _run_once(self, job_title: str, job_description: str, cache_key: str, deadline: float | None) -> dict:
+        qa_by_level, source = await self._cache_get(cache_key), "cache"
+        if qa_by_level is None:
+            qa_by_level, source = await self.generate_qa(job_title, job_description, deadline)
+            if self._cache is not None:
+                # Memory: a dict insert; database: a no-op (rows are tagged on save)
+                self._cache.set(cache_key, qa_by_level)
+        flat_qs = flatten_questions(qa_by_level)
+        record = await self._save(job_title, job_description, flat_qs, qa_by_level, cache_key)
+        return build_result(job_title, job_description, flat_qs, qa_by_level, source, record)
+
+    async def run(self, job_title: str, job_description: str, deadline: float | None = None) -> dict:
+        job_title, job_description = validate_posting(job_title, job_description)
+        cache_key = generation_cache_key(job_title, job_description)
+        if not self._coalesce:
+            return await self._run_once(job_title, job_description, cache_key, deadline)
+        task = self._inflight.get(cache_key)
+        if task is not None:
+            try:
+                # shield: a follower giving up must not cancel the shared generation
+                result = await asyncio.wait_for(asyncio.shield(task), remaining(deadline))
+            except asyncio.TimeoutError as e:
+                raise generation_error(e, deadline)
+            return dict(result, source="coalesced")
+        task = asyncio.ensure_future(self._run_once(job_title, job_description, cache_key, deadline))
+        self._inflight[cache_key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+        return await asyncio.shield(task)
+
+
+def create_asgi_app() -> Starlette:
+    """Create the Starlette application (tables must already exist; see `main`)."""
+    engine = create_async_engine(
+        settings.async_database_url or async_database_url(settings.database_url),
+        pool_pre_ping=True,
+        **POOL_OPTIONS,
+    )
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    limiter = (
+        AsyncConcurrencyLimiter(settings.gemini_max_concurrency, settings.gemini_acquire_timeout)
+        if settings.gemini_max_concurrency > 0 else None
+    )
+    agent = AsyncQuestionAgent(
+        sessions,
+        cache=build_cache(settings),
+        backend=build_backend(settings),
+        limiter=limiter,
+        scheduler=ModelCallScheduler.from_settings(settings),
+        coalesce=settings.singleflight in ("process", "database"),
+        serialize_writes=engine.dialect.name == "sqlite",
+    )
+
+    def _error(message: str, status: int) -> JSONResponse:
+        return JSONResponse({"error": message}, status_code=status)
+
+    async def agent_run(request: Request):
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        data = data if isinstance(data, dict) else {}
+        job_title = (data.get("job_title") or "").strip()
+        job_description = (data.get("job_description") or "").strip()
+        if not job_title or not job_description:
+            return _error("'job_title' and 'job_description' are required.", 400)
+        try:
+            deadline = request_deadline(request.headers.get("X-Request-Timeout"), request.query_params.get("timeout"))
+        except ValueError as e:
+            return _error(str(e), 400)
+        try:
+            return JSONResponse(await agent.run(job_title, job_description, deadline=deadline), status_code=201)
+        except DeadlineExceededError as e:
+            return _error(str(e), 504)
+        except AIUnavailableError as e:
+            return _error(str(e), 503)
+        except Exception as e:
+            return _error(str(e), 500)
+
+    async def get_saved(request: Request):
+        """See the Flask `get_saved`: same parameters, headers and body."""
+        args = request.query_params
+        job_title = args.get("job_title")
+        try:
+            fields = parse_fields(args.get("view"), args.get("fields"))
+        except ValueError as e:
+            return _error(str(e), 400)
+        try:
+            limit = max(1, min(int(args.get("limit", 50)), 200))
+            before_id = decode_cursor(args["cursor"]) if args.get("cursor") else None
+            if before_id is None and args.get("before_id"):
+                before_id = int(args["before_id"])
+        except ValueError:
+            return _error("invalid 'limit', 'cursor' or 'before_id'.", 400)
+
+        query = select(*select_columns(fields))
+        if job_title:
+            query = query.where(InterviewQuestion.job_title == job_title)
+        if before_id is not None:
+            query = query.where(InterviewQuestion.id < before_id)
+        async with sessions() as session:
+            rows = (await session.execute(query.order_by(InterviewQuestion.id.desc()).limit(limit + 1))).all()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            derived = derived_qa_statement(rows, fields)
+            derived_qa = dict((await session.execute(derived)).all()) if derived is not None else None
+        resp = Response(
+            "[" + ",".join(record_json(r, fields, derived_qa) for r in rows) + "]", media_type="application/json"
+        )
+        if has_more:
+            cursor = encode_cursor(rows[-1].id)
+            next_args = {k: v for k, v in args.items() if k not in ("cursor", "before_id")}
+            next_args["cursor"] = cursor
+            resp.headers["X-Next-Cursor"] = cursor
+            resp.headers["Link"] = f'<{request.url.path}?{urlencode(next_args)}>; rel="next"'
+        return resp
+
+    async def get_one(request: Request):
+        async with sessions() as session:
+            rec = await session.get(InterviewQuestion, request.path_params["record_id"])
+        if rec is None:
+            return _error("record not found", 404)
+        return Response(record_json(rec), media_type="application/json")
+
+    async def metrics(request: Request):
+        return Response(METRICS.render(), media_type=METRICS_CONTENT_TYPE)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        yield
+        await engine.dispose()
+
+    app = Starlette(
+        routes=[
+            Route("/agent", agent_run, methods=["POST"]),
+            Route("/get", get_saved, methods=["GET"]),
+            Route("/get/{record_id:int}", get_one, methods=["GET"]),
+            Route("/metrics", metrics, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+    app.state.agent = agent
+    return app
+
+
+def __getattr__(name: str):
+    # `uvicorn asgi:app` builds the app (and its engine) on first access, once per
+    # worker; `python asgi.py` only launches uvicorn and never builds one itself
+    if name == "app":
+        globals()["app"] = create_asgi_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bind", default=f"0.0.0.0:{settings.port}", help="HOST:PORT (default: 0.0.0.0:$PORT)")
+    parser.add_argument("--workers", type=int, default=1, help="processes; one usually suffices")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    from database import init_db
+
+    # Once, before any worker imports the app (uvicorn workers are spawned, not forked)
+    init_db()
+    host, _, port = args.bind.rpartition(":")
+    uvicorn.run(
+        "asgi:app",
+        host=host or "0.0.0.0",
+        port=int(port),
+        workers=max(1, args.workers),
+        timeout_graceful_shutdown=settings.web_graceful_timeout,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""Model backends behind `QuestionAgent` (and the ASGI app's `AsyncQuestionAgent`).
+
+A backend turns a prompt into response text (`agenerate` is the coroutine form); prompt building, validation and
+normalization stay in agent.py. Selected with MODEL_BACKEND:
+- `gemini` (default): google-genai `generate_content` / `generate_content_stream`.
+- `fake`: a local, seeded stand-in that needs no network or API key. It answers
+  with well-formed Q&A JSON after a latency drawn from a configurable
+  distribution, and can be told to return malformed JSON, fenced output or
+  retryable errors at given rates. Use it for load tests and benchmarks only.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from jsonstream import LEVELS
+
+
+@dataclass
+class ModelResponse:
+    text: str
+    # Prompt + output tokens when the backend reports them
+    total_tokens: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+
+
+class ModelBackend:
+    """Interface: `generate` returns the full response, `stream` yields text chunks.
+
+    timeout is in seconds (None = no limit). Errors carrying an HTTP-like `code`
+    attribute (429, 503, ...) are treated as retryable by the scheduler.
+    """
+
+    name = "base"
+
+    def generate(self, model: str, prompt: str, timeout: Optional[float] = None) -> ModelResponse:
+        raise NotImplementedError
+
+    def stream(self, model: str, prompt: str) -> Iterator[str]:
+        raise NotImplementedError
+
+    async def agenerate(self, model: str, prompt: str, timeout: Optional[float] = None) -> ModelResponse:
+        """`generate` for the ASGI app; backends without native async run it on a thread."""
+        return await asyncio.to_thread(self.generate, model, prompt, timeout)
+
+
+class GeminiBackend(ModelBackend):
+    """google-genai backend; one client (and connection pool) per backend instance."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str):
+        from google import genai
+
+        self.client = genai.Client(api_key=api_key)
+
+    @staticmethod
+    def _contents(prompt: str) -> list:
+        from google.genai import types as genai_types
+
+        return [genai_types.Content(role="user", parts=[genai_types.Part.from_text(text=prompt)])]
+
+    @staticmethod
+    def _config(timeout: Optional[float] = None):
+        from google.genai import types as genai_types
+
+        return genai_types.GenerateContentConfig(
+            response_modalities=["TEXT"],
+            # Ask explicitly for JSON output if supported by the SDK version
+            response_mime_type="application/json",
+            # HTTP timeout (ms) so a stalled call cannot outlive the request's deadline
+            http_options=genai_types.HttpOptions(timeout=max(1000, int(timeout * 1000))) if timeout is not None else None,
+        )
+
+    def generate(self, model: str, prompt: str, timeout: Optional[float] = None) -> ModelResponse:
+        resp = self.client.models.generate_content(
+            model=model, contents=self._contents(prompt), config=self._config(timeout)
+        )
+        return self._response(resp)
+
+    async def agenerate(self, model: str, prompt: str, timeout: Optional[float] = None) -> ModelResponse:
+        # client.aio shares the client's settings but has its own async HTTP pool
+        resp = await self.client.aio.models.generate_content(
+            model=model, contents=self._contents(prompt), config=self._config(timeout)
+        )
+        return self._response(resp)
+
+    @staticmethod
+    def _response(resp) -> ModelResponse:
+        # Aggregate textual output robustly
+        text_chunks = []
+        if getattr(resp, "text", None):
+            text_chunks.append(resp.text)
+        elif getattr(resp, "candidates", None):
+            for cand in resp.candidates:
+                if getattr(cand, "content", None) and getattr(cand.content, "parts", None):
+                    for part in cand.content.parts:
+                        t = getattr(part, "text", None)
+                        if t:
+                            text_chunks.append(t)
+        usage = getattr(resp, "usage_metadata", None)
+        return ModelResponse(
+            "\n".join(text_chunks).strip(),
+            getattr(usage, "total_token_count", None),
+            getattr(usage, "prompt_token_count", None),
+            getattr(usage, "candidates_token_count", None),
+        )
+
+    def stream(self, model: str, prompt: str) -> Iterator[str]:
+        for chunk in self.client.models.generate_content_stream(
+            model=model, contents=self._contents(prompt), config=self._config()
+        ):
+            text = getattr(chunk, "text", None)
+            if text:
+                yield text
+
+
+class FakeBackendError(Exception):
+    def __init__(self, message: str, code: int = 503):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+_LEVEL_REQUEST = re.compile(r"'(basic|intermediate|expert)' level")
+_TITLE = re.compile(r"^Job Title: (.*)$", re.MULTILINE)
+
+
+def parse_latency(spec: str):
+    """Parse a latency distribution: `fixed:S`, `uniform:LO,HI`, `lognormal:MEDIAN,SIGMA`
+    or `bimodal:FAST,SLOW,P_SLOW` (seconds). Returns a function of a random.Random."""
+    kind, _, args = (spec or "fixed:0").partition(":")
+    values = [float(v) for v in args.split(",") if v.strip()] if args else []
+    if kind == "fixed":
+        return lambda rng: values[0] if values else 0.0
+    if kind == "uniform":
+        lo, hi = values
+        return lambda rng: rng.uniform(lo, hi)
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda rng: median * rng.lognormvariate(0, sigma)
+    if kind == "bimodal":
+        fast, slow, p_slow = values
+        return lambda rng: slow if rng.random() < p_slow else fast
+    raise ValueError(f"unknown latency distribution: {spec}")
+
+
+class FakeBackend(ModelBackend):
+    """Deterministic (given a seed) stand-in that simulates Gemini's behaviour."""
+
+    name = "fake"
+
+    def __init__(
+        self,
+        latency: str = "fixed:0",
+        error_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        fenced_rate: float = 0.0,
+        pairs_per_level: int = 6,
+        seed: int = 0,
+    ):
+        self._latency = parse_latency(latency)
+        self._error_rate = error_rate
+        self._malformed_rate = malformed_rate
+        self._fenced_rate = fenced_rate
+        self._pairs = pairs_per_level
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings) -> "FakeBackend":
+        return cls(
+            latency=settings.fake_latency,
+            error_rate=settings.fake_error_rate,
+            malformed_rate=settings.fake_malformed_rate,
+            fenced_rate=settings.fake_fenced_rate,
+            seed=settings.fake_seed,
+        )
+
+    def _draw(self):
+        with self._lock:
+            return self._latency(self._rng), self._rng.random(), self._rng.random(), self._rng.random()
+
+    def _document(self, prompt: str) -> str:
+        match = _TITLE.search(prompt)
+        title = match.group(1).strip() if match else "the role"
+        requested = _LEVEL_REQUEST.search(prompt)
+        levels = (requested.group(1),) if requested else LEVELS
+        tag = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        doc = {
+            level: [
+                {
+                    "question": f"[{tag}] {level.capitalize()} question {i + 1} for {title}?",
+                    "answer": f"A concise {level} answer {i + 1} about {title}, covering the practical "
+                              "trade-offs an interviewer would expect to hear.",
+                }
+                for i in range(self._pairs)
+            ]
+            for level in levels
+        }
+        return json.dumps(doc, ensure_ascii=False)
+
+    def _plan(self, prompt: str):
+        """Draw (latency, error or None, response text) for one call."""
+        latency, error_roll, malformed_roll, fenced_roll = self._draw()
+        if error_roll < self._error_rate:
+            return latency, FakeBackendError("UNAVAILABLE (simulated)", code=503), ""
+        text = self._document(prompt)
+        if malformed_roll < self._malformed_rate:
+            # Truncated mid-document, as when the model stops early
+            text = text[: max(1, len(text) * 2 // 3)]
+        if fenced_roll < self._fenced_rate:
+            text = f"Here are the questions:\n```json\n{text}\n```\nGood luck!"
+        return latency, None, text
+
+    def generate(self, model: str, prompt: str, timeout: Optional[float] = None) -> ModelResponse:
+        latency, error, text = self._plan(prompt)
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise FakeBackendError("DEADLINE_EXCEEDED (simulated timeout)", code=504)
+        time.sleep(latency)
+        if error is not None:
+            raise error
+        return self._response(prompt, text)
+
+    async def agenerate(self, model: str, prompt: str, timeout: Optional[float] = None) -> ModelResponse:
+        latency, error, text = self._plan(prompt)
+        if timeout is not None and latency > timeout:
+            await asyncio.sleep(timeout)
+            raise FakeBackendError("DEADLINE_EXCEEDED (simulated timeout)", code=504)
+        await asyncio.sleep(latency)
+        if error is not None:
+            raise error
+        return self._response(prompt, text)
+
+    @staticmethod
+    def _response(prompt: str, text: str) -> ModelResponse:
+        # Roughly four characters per token, like the scheduler's estimate
+        return ModelResponse(text, (len(prompt) + len(text)) // 4, len(prompt) // 4, len(text) // 4)
+
+    def stream(self, model: str, prompt: str) -> Iterator[str]:
+        latency, error, text = self._plan(prompt)
+        # A fifth of the latency before the first chunk, the rest spread over the output
+        time.sleep(latency * 0.2)
+        if error is not None:
+            raise error
+        chunks = [text[i:i + 64] for i in range(0, len(text), 64)]
+        for chunk in chunks:
+            time.sleep(latency * 0.8 / len(chunks))
+            yield chunk
+
+
+def build_backend(settings) -> Optional[ModelBackend]:
+    """The configured backend, or None when Gemini is selected without an API key."""
+    if settings.model_backend == "fake":
+        return FakeBackend.from_settings(settings)
+    if settings.model_backend != "gemini":
+        raise ValueError(f"unknown MODEL_BACKEND: {settings.model_backend}")
+    return GeminiBackend(settings.gemini_api_key) if settings.gemini_api_key else None
@@ -0,0 +1,267 @@
+"""End-to-end API benchmark: /agent, /get and /agent/batch through create_app().
+
+Every (database, table size) configuration runs in its own subprocess, because
+settings are read from the environment at import time. Each subprocess
+- points DATABASE_URL at the target and wipes it,
+- seeds `interview_questions` with the requested number of rows,
+- sets MODEL_BACKEND=fake so generation costs only the simulated model latency
+  (`--model-latency`, see backends.py) and no network,
+- drives the Flask app through test clients from `--concurrency` threads.
+
+Measured per configuration: p50/p95/p99/mean latency and requests per second for
+POST /agent, GET /get (unfiltered, and filtered by job_title, alternating first
+and deep keyset pages) and POST /agent/batch (with items per second). The
+numbers cover the app, ORM and database; no HTTP server is involved.
+
+Usage:
+    python benchmarks/bench_api.py --sizes 1000,100000
+    python benchmarks/bench_api.py --databases sqlite,mysql+pymysql://u:p@localhost/scratch --json out.json
+    python benchmarks/bench_api.py --sizes 1000000,10000000 --requests 100 --env QUESTIONS_STORAGE=derived
+
+`sqlite` means a fresh temporary SQLite file. Other URLs are wiped: only use
+scratch schemas. Seeding 10M rows takes a while (minutes on SQLite).
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SEED_CHUNK = 10000
+SEED_QA = json.dumps({
+    level: [{"question": f"Seeded {level} question?", "answer": "Seeded answer."}]
+    for level in ("basic", "intermediate", "expert")
+})
+
+
+def _percentile(samples: list, q: float) -> float:
+    return samples[min(len(samples) - 1, max(0, int(round(q * len(samples))) - 1))]
+
+
+def _run_load(app, total: int, concurrency: int, send, expect: tuple) -> dict:
+    """Issue `total` requests from `concurrency` threads; send(client, i) returns a response."""
+    counter = itertools.count()
+    lock = threading.Lock()
+    samples, errors = [], [0]
+
+    def worker():
+        client = app.test_client()
+        while True:
+            with lock:
+                i = next(counter)
+            if i >= total:
+                return
+            t0 = time.perf_counter()
+            resp = send(client, i)
+            elapsed = (time.perf_counter() - t0) * 1000
+            with lock:
+                samples.append(elapsed)
+                if resp.status_code not in expect:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(max(1, min(concurrency, total)))]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    samples.sort()
+    return {
+        "requests": total,
+        "errors": errors[0],
+        "concurrency": len(threads),
+        "p50_ms": round(_percentile(samples, 0.50), 3),
+        "p95_ms": round(_percentile(samples, 0.95), 3),
+        "p99_ms": round(_percentile(samples, 0.99), 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "rps": round(total / wall, 2) if wall > 0 else None,
+    }
+
+
+def _reset(engine) -> None:
+    from sqlalchemy import text
+
+    from database import Base
+    import models  # noqa: F401  (registers every table on Base.metadata)
+    from search import FTS_TABLE
+
+    Base.metadata.drop_all(engine)
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+
+
+def _seed(engine, size: int, titles: int) -> float:
+    from sqlalchemy import insert
+
+    from models import InterviewQuestion
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        for start in range(0, size, SEED_CHUNK):
+            conn.execute(insert(InterviewQuestion), [
+                {
+                    "job_title": f"Role {i % titles}",
+                    "job_description": "Python, SQL, distributed systems",
+                    "questions": json.dumps([f"Seeded {lvl} question?" for lvl in ("basic", "intermediate", "expert")]),
+                    "qa": SEED_QA,
+                }
+                for i in range(start, min(size, start + SEED_CHUNK))
+            ])
+    return round(time.perf_counter() - started, 3)
+
+
+def _worker(args) -> None:
+    """Run every workload against one database/size; prints one JSON line."""
+    from database import engine, init_db, get_session
+    from models import InterviewQuestion
+
+    _reset(engine)
+    init_db()
+    seed_seconds = _seed(engine, args.size, args.titles)
+    with get_session() as session:
+        max_id = session.query(InterviewQuestion.id).order_by(InterviewQuestion.id.desc()).limit(1).scalar() or 0
+
+    from app import create_app
+
+    app = create_app()
+    run_id = f"{os.getpid()}-{time.time_ns()}"
+
+    def agent(client, i):
+        return client.post("/agent", json={
+            "job_title": f"Bench role {run_id}-{i}",
+            "job_description": "Design and operate backend services in Python.",
+        })
+
+    def get_unfiltered(client, i):
+        return client.get("/get?limit=50" + (f"&before_id={max_id // 2}" if i % 2 else ""))
+
+    def get_filtered(client, i):
+        title = f"Role {i % args.titles}"
+        return client.get("/get", query_string={
+            "job_title": title, "limit": 50, **({"before_id": max_id // 2} if i % 2 else {}),
+        })
+
+    def batch(client, i):
+        return client.post("/agent/batch", json={"items": [
+            {"job_title": f"Batch role {run_id}-{i}-{j}", "job_description": "Batch generated posting."}
+            for j in range(args.batch_size)
+        ]})
+
+    # Warm up connections, caches and lazy imports outside the measurements
+    warm = app.test_client()
+    warm.get("/get?limit=1")
+    agent(warm, -1)
+
+    results = {
+        "agent": _run_load(app, args.requests, args.concurrency, agent, (201,)),
+        "get_unfiltered": _run_load(app, args.requests, args.concurrency, get_unfiltered, (200,)),
+        "get_filtered": _run_load(app, args.requests, args.concurrency, get_filtered, (200,)),
+        "batch": _run_load(app, args.batches, args.concurrency, batch, (201,)),
+    }
+    results["batch"]["batch_size"] = args.batch_size
+    if results["batch"]["rps"]:
+        results["batch"]["items_per_s"] = round(results["batch"]["rps"] * args.batch_size, 2)
+
+    _reset(engine)
+    print(json.dumps({"database": engine.dialect.name, "rows": args.size, "seed_seconds": seed_seconds, "results": results}))
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--databases", default="sqlite", help="comma-separated: `sqlite` and/or scratch database URLs")
+    parser.add_argument("--sizes", default="1000,100000", help="comma-separated seeded row counts")
+    parser.add_argument("--titles", type=int, default=1000, help="distinct seeded job titles")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads")
+    parser.add_argument("--batches", type=int, default=10, help="POST /agent/batch requests")
+    parser.add_argument("--batch-size", type=int, default=50, help="items per batch")
+    parser.add_argument("--model-latency", default="fixed:0", help="fake model latency distribution")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra settings for the app")
+    parser.add_argument("--json", dest="json_path", default=None, help="write results to this file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(args)
+        return
+
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    base_env = {
+        **os.environ,
+        "MODEL_BACKEND": "fake",
+        "FAKE_LATENCY": args.model_latency,
+        # Every /agent request must reach the (fake) model
+        "GENERATION_CACHE": "none",
+        "SIMILARITY_THRESHOLD": "0",
+        **extra_env,
+    }
+    runs = []
+    tmpdir = tempfile.mkdtemp(prefix="bench-api-")
+    print(f"{'database':>9} {'rows':>10} {'endpoint':>15} {'p50':>10} {'p95':>10} {'p99':>10} {'rps':>9} {'err':>4}")
+    for database in [d.strip() for d in args.databases.split(",") if d.strip()]:
+        for size in [int(x) for x in args.sizes.split(",") if x.strip()]:
+            url = database
+            if database == "sqlite":
+                url = f"sqlite:///{os.path.join(tmpdir, f'bench-{size}.db')}"
+            cmd = [
+                sys.executable, os.path.abspath(__file__), "--worker", "--size", str(size),
+                "--titles", str(args.titles), "--requests", str(args.requests),
+                "--concurrency", str(args.concurrency), "--batches", str(args.batches),
+                "--batch-size", str(args.batch_size),
+            ]
+            proc = subprocess.run(
+                cmd, env={**base_env, "DATABASE_URL": url}, cwd=ROOT, capture_output=True, text=True
+            )
+            if proc.returncode != 0:
+                print(proc.stderr, file=sys.stderr)
+                raise SystemExit(f"benchmark worker failed for {database} / {size} rows")
+            if database == "sqlite":
+                os.remove(os.path.join(tmpdir, f"bench-{size}.db"))
+            run = json.loads(proc.stdout.strip().splitlines()[-1])
+            runs.append(run)
+            for endpoint, r in run["results"].items():
+                print(
+                    f"{run['database']:>9} {size:>10} {endpoint:>15} {r['p50_ms']:>8.2f}ms "
+                    f"{r['p95_ms']:>8.2f}ms {r['p99_ms']:>8.2f}ms {r['rps'] or 0:>9.1f} {r['errors']:>4}"
+                )
+
+    shutil.rmtree(tmpdir, ignore_errors=True)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump({
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "model_latency": args.model_latency,
+                "concurrency": args.concurrency,
+                "env": extra_env,
+                "runs": runs,
+            }, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
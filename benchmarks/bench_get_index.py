@@ -0,0 +1,124 @@
+"""Filtered GET /get listing latency versus table size, with and without indexes.
+
+Runs the query issued by `get_saved` (filter on job_title, order by id desc,
+limit 50, optionally seeking past a cursor) against tables of increasing size,
+first with the model-declared indexes and then after dropping them.
+
+Usage:
+    python benchmarks/bench_get_index.py --sizes 1000,10000,100000
+    python benchmarks/bench_get_index.py --database-url mysql+pymysql://u:p@localhost/scratch
+
+The target database is wiped: only point --database-url at a scratch schema.
+Defaults to a temporary SQLite file. Prints a table and, with --json, writes the
+raw numbers for comparison between commits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, text  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from database import Base  # noqa: E402
+from models import InterviewQuestion  # noqa: E402
+
+PAGE = 50
+
+
+def _seed(engine, size: int, titles: int) -> None:
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    rows = [
+        {
+            "job_title": f"Role {i % titles}",
+            "job_description": "Python, SQL, distributed systems",
+            "questions": "[]",
+            "qa": None,
+        }
+        for i in range(size)
+    ]
+    with engine.begin() as conn:
+        for start in range(0, size, 10000):
+            conn.execute(insert(InterviewQuestion), rows[start:start + 10000])
+
+
+def _time_listing(engine, repeats: int, titles: int) -> dict:
+    samples = []
+    with Session(engine) as session:
+        max_id = session.query(InterviewQuestion.id).order_by(InterviewQuestion.id.desc()).limit(1).scalar() or 0
+        for i in range(repeats):
+            title = f"Role {i % titles}"
+            # Alternate first pages with deep keyset pages
+            before_id = max_id // 2 if i % 2 else None
+            t0 = time.perf_counter()
+            query = session.query(InterviewQuestion).filter(InterviewQuestion.job_title == title)
+            if before_id is not None:
+                query = query.filter(InterviewQuestion.id < before_id)
+            query.order_by(InterviewQuestion.id.desc()).limit(PAGE).all()
+            samples.append((time.perf_counter() - t0) * 1000)
+            session.expunge_all()
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+    }
+
+
+def _drop_indexes(engine) -> None:
+    with engine.begin() as conn:
+        for index in InterviewQuestion.__table__.indexes:
+            if index.name == "ix_interview_questions_cache_key":
+                continue
+            if engine.dialect.name == "mysql":
+                conn.execute(text(f"DROP INDEX {index.name} ON interview_questions"))
+            else:
+                conn.execute(text(f"DROP INDEX {index.name}"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated row counts")
+    parser.add_argument("--titles", type=int, default=1000, help="distinct job titles (selectivity of the filter)")
+    parser.add_argument("--repeats", type=int, default=200, help="queries per measurement")
+    parser.add_argument("--database-url", default=None, help="scratch database (default: temp SQLite)")
+    parser.add_argument("--json", dest="json_path", default=None, help="write results to this file")
+    args = parser.parse_args()
+
+    url = args.database_url
+    tmpdir = None
+    if not url:
+        tmpdir = tempfile.mkdtemp(prefix="bench-get-")
+        url = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    engine = create_engine(url, future=True)
+
+    results = []
+    print(f"{'rows':>10} {'indexed p50':>12} {'indexed p95':>12} {'no-index p50':>13} {'no-index p95':>13}")
+    for size in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        _seed(engine, size, args.titles)
+        indexed = _time_listing(engine, args.repeats, args.titles)
+        _drop_indexes(engine)
+        unindexed = _time_listing(engine, max(10, args.repeats // 10), args.titles)
+        results.append({"rows": size, "indexed": indexed, "no_index": unindexed})
+        print(
+            f"{size:>10} {indexed['p50_ms']:>10.3f}ms {indexed['p95_ms']:>10.3f}ms "
+            f"{unindexed['p50_ms']:>11.3f}ms {unindexed['p95_ms']:>11.3f}ms"
+        )
+
+    Base.metadata.drop_all(engine)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump({"database": engine.dialect.name, "page": PAGE, "titles": args.titles, "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
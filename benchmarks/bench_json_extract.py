@@ -0,0 +1,126 @@
+"""JSON extraction from malformed model output: greedy regex vs. `extract_json`.
+
+Compares the fallback `generate_qa` used to run when `json.loads` failed
+(greedy `\\{[\\s\\S]*\\}` / `\\[[\\s\\S]*\\]` regexes, then re-parsing) with the
+single-pass `jsonstream.extract_json`, on a corpus of
+malformed responses: prose and fences around the JSON, braces in prose or inside
+strings, trailing junk, a second JSON block, truncated documents and large
+junk-filled outputs.
+
+The corpus is synthetic. Each case is built to reproduce a failure shape seen in
+model output, and its size scales with --scale. It is representative, not
+captured from production.
+
+Usage:
+    python benchmarks/bench_json_extract.py [--scale 1] [--repeats 20] [--json out.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jsonstream import extract_json  # noqa: E402
+
+
+def legacy_extract(cleaned: str):
+    """The previous fallback in generate_qa (after fence stripping)."""
+    match_obj = re.search(r"\{[\s\S]*\}", cleaned)
+    match_arr = re.search(r"\[[\s\S]*\]", cleaned)
+    if match_obj:
+        return json.loads(match_obj.group(0))
+    if match_arr:
+        return {"basic": json.loads(match_arr.group(0))}
+    raise ValueError("no JSON")
+
+
+def _document(pairs: int) -> dict:
+    return {
+        level: [
+            {
+                "question": f"How would you design a {level} service #{i} (e.g. {{tenant}} routing)?",
+                "answer": 'Use a queue; quote "at-least-once" semantics and keep handlers idempotent [1].',
+            }
+            for i in range(pairs)
+        ]
+        for level in ("basic", "intermediate", "expert")
+    }
+
+
+def build_corpus(scale: int) -> list:
+    """(name, response text, expected value or None when nothing valid exists)."""
+    doc = _document(8 * scale)
+    body = json.dumps(doc)
+    pretty = json.dumps(doc, indent=2)
+    array = json.dumps(doc["basic"])
+    junk_line = "INFO worker-3 processed batch {id=42, ok} in 12ms; retrying [shard 7\n"
+    return [
+        ("prose_and_fence", f"Sure! Here are your questions:\n```json\n{pretty}\n```\nLet me know if you need more.", doc),
+        ("braces_in_prose_before", f"Using the {{role}} and {{level}} placeholders you gave me:\n{body}", doc),
+        ("trailing_prose_with_braces", f"{body}\n\nNote: answers assume a {{typical}} setup.", doc),
+        ("second_json_block", f"{body}\n\nAlternative format:\n{{\"basic\": []}}", doc),
+        ("bare_array_with_prose", f"Only basic questions this time:\n{array}\nDone.", doc["basic"]),
+        ("truncated", body[: len(body) * 3 // 4], None),
+        ("junk_then_json", junk_line * (200 * scale) + body, doc),
+        ("large_junk_no_json", junk_line * (2000 * scale), None),
+    ]
+
+
+def _matches(got, expected) -> bool:
+    if isinstance(expected, list) and isinstance(got, dict):
+        got = got.get("basic")
+    return got == expected
+
+
+def _time(fn, text: str, repeats: int):
+    samples, value = [], None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        try:
+            value = fn(text)
+        except ValueError:
+            value = None
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=1, help="multiplies document and junk sizes")
+    parser.add_argument("--repeats", type=int, default=20, help="timed runs per case (median reported)")
+    parser.add_argument("--json", dest="json_path", default=None, help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'case':>28} {'bytes':>9} {'regex ms':>10} {'ok':>3} {'extract ms':>11} {'ok':>3}")
+    for name, text, expected in build_corpus(args.scale):
+        legacy_ms, legacy_value = _time(legacy_extract, text, args.repeats)
+        new_ms, new_value = _time(extract_json, text, args.repeats)
+        row = {
+            "case": name,
+            "bytes": len(text),
+            "regex_ms": round(legacy_ms, 4),
+            "regex_correct": _matches(legacy_value, expected),
+            "extract_ms": round(new_ms, 4),
+            "extract_correct": _matches(new_value, expected),
+        }
+        results.append(row)
+        print(
+            f"{name:>28} {len(text):>9} {legacy_ms:>10.3f} {'y' if row['regex_correct'] else 'n':>3} "
+            f"{new_ms:>11.3f} {'y' if row['extract_correct'] else 'n':>3}"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump({"scale": args.scale, "repeats": args.repeats, "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
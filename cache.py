@@ -0,0 +1,177 @@
+"""Generation cache placed in front of `QuestionAgent.generate_qa`.
+
+Keys are content hashes of the normalized job title, the job description, the
+model name and the prompt version, so changing the model or the prompt
+naturally invalidates previous entries.
+
+Backends:
+- MemoryCacheBackend: in-process LRU with TTL (per worker process)
+- DatabaseCacheBackend: reuses rows already stored in `interview_questions`,
+  which are tagged with their `cache_key` when saved
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from metrics import REGISTRY
+
+QAByLevel = Dict[str, List[Dict[str, str]]]
+
+CACHE_REQUESTS = REGISTRY.counter(
+    "generation_cache_requests_total", "Generation cache lookups (backend errors count as misses)", ("result",)
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_title(job_title: str) -> str:
+    """Collapse whitespace and case-fold so trivially different titles share a key."""
+    return _WHITESPACE.sub(" ", job_title or "").strip().casefold()
+
+
+def normalize_description(job_description: str) -> str:
+    """Collapse whitespace only; wording and case of descriptions are meaningful."""
+    return _WHITESPACE.sub(" ", job_description or "").strip()
+
+
+def make_cache_key(job_title: str, job_description: str, model: str, prompt_version: str) -> str:
+    """Return a stable hex digest identifying one generation request."""
+    payload = json.dumps(
+        [normalize_title(job_title), normalize_description(job_description), model, prompt_version],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CacheBackend:
+    """Interface implemented by cache backends."""
+
+    def get(self, key: str) -> Optional[QAByLevel]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: QAByLevel) -> None:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Thread-safe in-process LRU cache with a per-entry TTL.
+
+    Values are stored as JSON text so callers can never mutate a cached entry.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 86400):
+        self._max_entries = max(1, max_entries)
+        self._ttl = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[QAByLevel]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return json.loads(payload)
+
+    def set(self, key: str, value: QAByLevel) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        expires_at = time.monotonic() + self._ttl if self._ttl > 0 else 0.0
+        with self._lock:
+            self._entries[key] = (expires_at, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+class DatabaseCacheBackend(CacheBackend):
+    """Serve cache hits from previously saved `interview_questions` rows.
+
+    Rows are tagged with `cache_key` by the save callback, so `set()` has nothing
+    to write. Naive timestamps (SQLite CURRENT_TIMESTAMP) are treated as UTC.
+    """
+
+    def __init__(self, ttl_seconds: int = 86400):
+        self._ttl = ttl_seconds
+
+    @staticmethod
+    def statement(key: str):
+        """SELECT of the newest row tagged with `key` (shared with the async app)."""
+        from sqlalchemy import select
+
+        from models import InterviewQuestion
+
+        return (
+            select(InterviewQuestion.qa, InterviewQuestion.created_at)
+            .where(InterviewQuestion.cache_key == key)
+            .order_by(InterviewQuestion.id.desc())
+            .limit(1)
+        )
+
+    def get(self, key: str) -> Optional[QAByLevel]:
+        from database import get_session
+
+        with get_session() as session:
+            row = session.execute(self.statement(key)).first()
+        return self.from_row(row)
+
+    def from_row(self, row) -> Optional[QAByLevel]:
+        """Decode a row from `statement()`; None when missing or older than the TTL."""
+        if row is None or not row.qa:
+            return None
+        if self._ttl > 0 and row.created_at is not None:
+            created_at = row.created_at
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            if created_at < datetime.now(timezone.utc) - timedelta(seconds=self._ttl):
+                return None
+        value = json.loads(row.qa)
+        return value if isinstance(value, dict) else None
+
+    def set(self, key: str, value: QAByLevel) -> None:
+        pass
+
+
+class GenerationCache:
+    """Facade used by QuestionAgent; backend failures are treated as misses."""
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+
+    def get(self, key: str) -> Optional[QAByLevel]:
+        try:
+            value = self.backend.get(key)
+        except Exception:
+            value = None
+        CACHE_REQUESTS.inc(result="miss" if value is None else "hit")
+        return value
+
+    def set(self, key: str, value: QAByLevel) -> None:
+        try:
+            self.backend.set(key, value)
+        except Exception:
+            pass
+
+
+def build_cache(settings) -> Optional[GenerationCache]:
+    """Build the cache configured by `settings.cache_backend` (memory|database|none)."""
+    kind = (settings.cache_backend or "").strip().lower()
+    if kind == "memory":
+        return GenerationCache(MemoryCacheBackend(settings.cache_max_entries, settings.cache_ttl_seconds))
+    if kind == "database":
+        return GenerationCache(DatabaseCacheBackend(settings.cache_ttl_seconds))
+    if kind in ("", "none", "off"):
+        return None
+    raise ValueError(f"unknown GENERATION_CACHE backend: {settings.cache_backend!r}")
@@ -1,7 +1,8 @@
 """Application configuration loading.
 
 Loads environment variables from `.env` when present and exposes a typed
-`Settings` object used across the app (Flask port/env, DB URL, Gemini model/key).
+`Settings` object used across the app (Flask port/env, DB URL, Gemini model/key
+and call scheduling, generation cache).
 """
 
 import os
@@ -23,12 +24,105 @@ class Settings:
     port: int = int(os.getenv("PORT", "5000"))
     env: str = os.getenv("FLASK_ENV", "development")
 
+    # Production server (serve.py): processes and threads per process. /agent calls
+    # mostly wait on Gemini, so threads are cheap; WEB_THREADS bounds in-flight
+    # requests per process
+    web_workers: int = int(os.getenv("WEB_WORKERS", "2"))
+    web_threads: int = int(os.getenv("WEB_THREADS", "32"))
+    # Seconds a silent worker survives before it is restarted, and how long in-flight
+    # requests get to finish on shutdown; keep both above AGENT_TIMEOUT
+    web_timeout: int = int(os.getenv("WEB_TIMEOUT", "120"))
+    web_graceful_timeout: int = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "90"))
+
     # Database
     database_url: str = os.getenv("DATABASE_URL") or _default_database_url()
+    # Connections per process (0 = SQLAlchemy's default of 5, plus overflow); size
+    # it near WEB_THREADS so request threads do not queue for a connection
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "0"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    # Async driver URL for the ASGI app (asgi.py); derived from DATABASE_URL when unset
+    # (sqlite -> sqlite+aiosqlite, mysql -> mysql+aiomysql)
+    async_database_url: str | None = os.getenv("ASYNC_DATABASE_URL") or None
+
+    # Model backend: gemini | fake (local stand-in for load tests, see backends.py)
+    model_backend: str = os.getenv("MODEL_BACKEND", "gemini")
+    # Fake backend: latency distribution (fixed:S | uniform:LO,HI | lognormal:MEDIAN,SIGMA |
+    # bimodal:FAST,SLOW,P_SLOW, seconds), failure rates (0-1) and RNG seed
+    fake_latency: str = os.getenv("FAKE_LATENCY", "fixed:0")
+    fake_error_rate: float = float(os.getenv("FAKE_ERROR_RATE", "0"))
+    fake_malformed_rate: float = float(os.getenv("FAKE_MALFORMED_RATE", "0"))
+    fake_fenced_rate: float = float(os.getenv("FAKE_FENCED_RATE", "0"))
+    fake_seed: int = int(os.getenv("FAKE_SEED", "0"))
 
     # Gemini
     gemini_api_key: str | None = os.getenv("GEMINI_API_KEY") or None
     gemini_model: str = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
+    # Max in-flight Gemini calls per process (0 = unlimited) and how long to wait for a slot
+    gemini_max_concurrency: int = int(os.getenv("GEMINI_MAX_CONCURRENCY", "0"))
+    gemini_acquire_timeout: float = float(os.getenv("GEMINI_ACQUIRE_TIMEOUT", "30"))
+    # Per-process request/token budgets for the call scheduler (0 = unlimited); set
+    # them to the provider quota divided by the number of processes
+    gemini_rpm: float = float(os.getenv("GEMINI_RPM", "0"))
+    gemini_tpm: float = float(os.getenv("GEMINI_TPM", "0"))
+    # Output tokens assumed per call until the response reports real usage
+    gemini_expected_output_tokens: int = int(os.getenv("GEMINI_EXPECTED_OUTPUT_TOKENS", "2500"))
+    gemini_queue_timeout: float = float(os.getenv("GEMINI_QUEUE_TIMEOUT", "60"))
+    # Retries of 429/5xx/timeouts with jittered exponential backoff
+    gemini_max_retries: int = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+    gemini_backoff_base: float = float(os.getenv("GEMINI_BACKOFF_BASE", "1"))
+    gemini_backoff_max: float = float(os.getenv("GEMINI_BACKOFF_MAX", "30"))
+    # Consecutive retryable failures before calls fail fast (0 = never), and for how long
+    gemini_breaker_threshold: int = int(os.getenv("GEMINI_BREAKER_THRESHOLD", "5"))
+    gemini_breaker_reset: float = float(os.getenv("GEMINI_BREAKER_RESET", "30"))
+    # Faster model used as the hedge target / fallback when the primary is slow or fails
+    gemini_fallback_model: str | None = os.getenv("GEMINI_FALLBACK_MODEL") or None
+    # Hedging: start a backup request once the primary exceeds the recent p95 latency
+    # (GEMINI_HEDGE_DELAY seconds until enough samples exist, never below the min delay)
+    gemini_hedging: bool = os.getenv("GEMINI_HEDGING", "off").lower() in ("1", "true", "yes", "on")
+    gemini_hedge_delay: float = float(os.getenv("GEMINI_HEDGE_DELAY", "10"))
+    gemini_hedge_min_delay: float = float(os.getenv("GEMINI_HEDGE_MIN_DELAY", "1"))
+
+    # Default per-request deadline for POST /agent in seconds (0 = none); clients may
+    # ask for less with the X-Request-Timeout header or ?timeout=
+    agent_timeout: float = float(os.getenv("AGENT_TIMEOUT", "60"))
+
+    # single: one prompt for all levels | per_level: three concurrent level prompts,
+    # each retried up to GENERATION_LEVEL_RETRIES times when its JSON is invalid
+    generation_mode: str = os.getenv("GENERATION_MODE", "single")
+    level_retries: int = int(os.getenv("GENERATION_LEVEL_RETRIES", "2"))
+
+    # Worker threads per process for POST /agent?async=1
+    job_workers: int = int(os.getenv("JOB_WORKERS", "4"))
+
+    # POST /agent/batch: concurrent generations per batch and max items per request
+    batch_concurrency: int = int(os.getenv("BATCH_CONCURRENCY", "8"))
+    batch_max_items: int = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+
+    # How the flat `questions` column is stored: duplicate (full JSON list) | derived
+    # (empty marker, rebuilt from `qa` on read). See `python manage.py --help`.
+    questions_storage: str = os.getenv("QUESTIONS_STORAGE", "duplicate")
+
+    # Generation cache: memory | database | none
+    cache_backend: str = os.getenv("GENERATION_CACHE", "memory")
+    cache_ttl_seconds: int = int(os.getenv("GENERATION_CACHE_TTL", "86400"))
+    cache_max_entries: int = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "1024"))
+
+    # Coalescing of identical concurrent /agent requests:
+    # database (across processes via a lease row) | process | off
+    singleflight: str = os.getenv("SINGLEFLIGHT", "database")
+
+    # Request tracing: log the span tree of requests slower than TRACE_SLOW_MS as JSON
+    # (0 = off) and/or append every request's spans to TRACE_EXPORT_PATH as OTLP JSON lines
+    trace_slow_ms: float = float(os.getenv("TRACE_SLOW_MS", "0"))
+    trace_export_path: str | None = os.getenv("TRACE_EXPORT_PATH") or None
+
+    # Bearer token for /admin/* endpoints (sampling profiler); unset = endpoints disabled
+    admin_token: str | None = os.getenv("ADMIN_TOKEN") or None
+
+    # Near-duplicate reuse: estimated similarity (0-1) needed to serve a stored
+    # record instead of calling Gemini; 0 disables it
+    similarity_threshold: float = float(os.getenv("SIMILARITY_THRESHOLD", "0"))
+    similarity_max_entries: int = int(os.getenv("SIMILARITY_MAX_ENTRIES", "20000"))
 
 
 settings = Settings()
@@ -2,7 +2,9 @@
 
 Creates the SQLAlchemy engine and session factory and provides `init_db()` to
 create tables. Also includes a safe, best-effort auto-migration to ensure the
-optional `qa` column exists in `interview_questions`.
+optional `qa`, `cache_key` and `batch_id` columns exist in `interview_questions`, and that
+every model-declared index exists on already-deployed tables, plus the
+full-text search index over Q&A pairs.
 """
 
 from __future__ import annotations
@@ -13,6 +15,15 @@ from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 
 from config import settings
+from metrics import REGISTRY
+from tracing import span
+
+# Time to obtain a pooled connection; grows when every pool slot is checked out
+DB_CHECKOUT_SECONDS = REGISTRY.histogram(
+    "db_pool_checkout_seconds",
+    "Wait for a database connection from the pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 30),
+)
 
 
 class Base(DeclarativeBase):
@@ -20,60 +31,113 @@ class Base(DeclarativeBase):
     pass
 
 
+# Pool size per process; only passed when configured so SQLite's default pools keep working.
+# Also used by the async engine of the ASGI app (asgi.py)
+POOL_OPTIONS = (
+    {"pool_size": settings.db_pool_size, "max_overflow": settings.db_max_overflow}
+    if settings.db_pool_size > 0 else {}
+)
+
 # Create engine; pool_pre_ping helps avoid stale connections for MySQL
 engine = create_engine(
     settings.database_url,
     pool_pre_ping=True,  # avoid stale MySQL connections
     future=True,
+    **POOL_OPTIONS,
 )
 
 # Session factory
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
 
 
+def _column_exists(table: str, column: str) -> bool:
+    """Return True if `column` exists on `table` (SHOW COLUMNS on MySQL, inspector elsewhere)."""
+    try:
+        with engine.connect() as conn:
+            res = conn.execute(text(f"SHOW COLUMNS FROM {table} LIKE '{column}'"))
+            if res.first() is not None:
+                return True
+    except Exception:
+        # SHOW COLUMNS is MySQL-only; fall back to the SQLAlchemy inspector
+        pass
+    inspector = inspect(engine)
+    return column in {col["name"] for col in inspector.get_columns(table)}
+
+
+def _add_column(table: str, column: str, ddl: str) -> None:
+    """Add a column if missing; `ddl` is the full ALTER TABLE statement."""
+    if _column_exists(table, column):
+        return
+    with engine.begin() as conn:
+        try:
+            conn.execute(text(ddl))
+        except Exception as e:
+            # Ignore duplicate column error (MySQL 1060) to keep idempotent
+            msg = str(e).lower()
+            if "duplicate column" in msg or "1060" in msg:
+                pass
+            else:
+                raise
+
+
 def init_db() -> None:
     """Import models and create tables if they don't exist."""
     # Import models here to ensure they are registered with Base.metadata
-    from models import InterviewQuestion  # noqa: F401
+    from models import InterviewQuestion, QAPair, GenerationJob, GenerationLease  # noqa: F401
 
     # Create ORM-declared tables if they don't exist
     Base.metadata.create_all(bind=engine)
 
-    # Lightweight, safe migration: ensure optional columns exist
+    # Lightweight, safe migrations: ensure optional columns exist.
+    # Don't block app startup if inspection or migration fails.
+    # A clearer DB error will surface on insert. This is intentionally silent to avoid
+    # breaking environments without permissions for ALTER TABLE.
     try:
-        # First attempt: use SHOW COLUMNS for exact existence check (MySQL)
-        qa_exists = False
-        with engine.connect() as conn:
-            res = conn.execute(text("SHOW COLUMNS FROM interview_questions LIKE 'qa'"))
-            qa_exists = res.first() is not None
-
-        if not qa_exists:
-            # Fallback to SQLAlchemy inspector if SHOW COLUMNS is unavailable
+        if not _column_exists("interview_questions", "qa"):
             try:
-                inspector = inspect(engine)
-                columns = {col["name"] for col in inspector.get_columns("interview_questions")}
-                qa_exists = "qa" in columns
+                _add_column("interview_questions", "qa", "ALTER TABLE interview_questions ADD COLUMN qa TEXT NULL AFTER questions")
             except Exception:
-                # ignore and proceed with ALTER guarded by duplicate check
-                pass
+                # `AFTER` is MySQL-only syntax
+                _add_column("interview_questions", "qa", "ALTER TABLE interview_questions ADD COLUMN qa TEXT NULL")
+    except Exception:
+        pass
 
-        if not qa_exists:
-            with engine.begin() as conn:
-                try:
-                    conn.execute(text("ALTER TABLE interview_questions ADD COLUMN qa TEXT NULL AFTER questions"))
-                except Exception as e:
-                    # Ignore duplicate column error (MySQL 1060) to keep idempotent
-                    msg = str(e).lower()
-                    if "duplicate column" in msg or "1060" in msg:
-                        pass
-                    else:
-                        raise
+    try:
+        _add_column("interview_questions", "cache_key", "ALTER TABLE interview_questions ADD COLUMN cache_key VARCHAR(64) NULL")
     except Exception:
-        # Don't block app startup if inspection or migration fails.
-        # A clearer DB error will surface on insert. This is intentionally silent to avoid
-        # breaking environments without permissions for ALTER TABLE.
         pass
 
+    try:
+        _add_column("interview_questions", "batch_id", "ALTER TABLE interview_questions ADD COLUMN batch_id VARCHAR(32) NULL")
+    except Exception:
+        pass
+
+    _ensure_indexes()
+
+    # Full-text index over Q&A pairs (FTS5 on SQLite, FULLTEXT on MySQL)
+    try:
+        from search import ensure_search_index
+
+        ensure_search_index(engine)
+    except Exception:
+        pass
+
+
+def _ensure_indexes() -> None:
+    """Create any model-declared index missing from an existing table.
+
+    `create_all` only creates indexes together with new tables, so deployments
+    created before an index was declared get it here. On large MySQL tables the
+    first startup after an upgrade runs the (online) index build.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception:
+                # Same policy as column migrations: never block startup
+                pass
+
 
 @contextmanager
 def get_session():
@@ -85,8 +149,12 @@ def get_session():
     """
     session = SessionLocal()
     try:
+        # Check the connection out up front so pool waits are measured on their own
+        with DB_CHECKOUT_SECONDS.time():
+            session.connection()
         yield session
-        session.commit()
+        with span("db.commit"):
+            session.commit()
     except Exception:
         session.rollback()
         raise
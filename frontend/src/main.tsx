@@ -2,6 +2,8 @@ import React from 'react'
 import { createRoot } from 'react-dom/client'
 import './index.css'
 
+type LevelKey = 'basic' | 'intermediate' | 'expert'
+
 const api = {
   agent: async (job_title: string, job_description: string) => {
     const r = await fetch('/agent', {
@@ -13,16 +15,58 @@ const api = {
     if (!r.ok) throw new Error(data?.error || `Request failed (${r.status})`)
     return data
   },
+  // Streams /agent/stream (SSE over a POST body) and reports each pair as it arrives
+  agentStream: async (
+    job_title: string,
+    job_description: string,
+    onPair: (p: { level: LevelKey, question: string, answer: string }) => void
+  ) => {
+    const r = await fetch('/agent/stream', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ job_title, job_description })
+    })
+    if (!r.ok || !r.body) {
+      const data = await r.json().catch(() => null)
+      throw new Error(data?.error || `Request failed (${r.status})`)
+    }
+    const reader = r.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    let done: any = null
+    while (true) {
+      const { value, done: finished } = await reader.read()
+      if (finished) break
+      buffer += decoder.decode(value, { stream: true })
+      let sep
+      while ((sep = buffer.indexOf('\n\n')) >= 0) {
+        const raw = buffer.slice(0, sep)
+        buffer = buffer.slice(sep + 2)
+        const event = raw.match(/^event: (.*)$/m)?.[1]
+        const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || 'null')
+        if (event === 'qa') onPair(data)
+        else if (event === 'done') done = data
+        else if (event === 'error') throw new Error(data?.error || 'Generation failed')
+      }
+    }
+    if (!done) throw new Error('Stream ended before completion')
+    return done
+  },
+  // Summary rows only (id, title, timestamp); details are fetched per record on expand
   history: async () => {
-    const r = await fetch('/get?limit=50')
+    const r = await fetch('/get?limit=50&view=summary')
     const data = await r.json()
     if (!r.ok) throw new Error(`Failed to load history (${r.status})`)
     return data as Array<any>
+  },
+  record: async (id: number) => {
+    const r = await fetch(`/get/${id}`)
+    const data = await r.json()
+    if (!r.ok) throw new Error(data?.error || `Failed to load record (${r.status})`)
+    return data
   }
 }
 
-type LevelKey = 'basic' | 'intermediate' | 'expert'
-
 function QACard({ qa, level }: { qa: any, level: LevelKey }) {
   const pairs: Array<{question: string, answer: string}> = Array.isArray(qa?.[level]) ? qa[level] : []
   return (
@@ -48,11 +92,17 @@ function QACard({ qa, level }: { qa: any, level: LevelKey }) {
 
 function History({ level }: { level: LevelKey }) {
   const [items, setItems] = React.useState<any[]>([])
+  const [details, setDetails] = React.useState<Record<number, any>>({})
   const [loading, setLoading] = React.useState(false)
   const load = async () => {
     setLoading(true)
     try { setItems(await api.history()) } finally { setLoading(false) }
   }
+  const loadDetails = async (id: number) => {
+    if (details[id]) return
+    const rec = await api.record(id)
+    setDetails(prev => ({ ...prev, [id]: rec }))
+  }
   React.useEffect(() => { load() }, [])
   return (
     <div className="card">
@@ -66,14 +116,20 @@ function History({ level }: { level: LevelKey }) {
         <ul className="space-y-3">
           {items.map((rec) => (
             <li key={rec.id}>
-              <details>
+              <details onToggle={e => { if ((e.currentTarget as HTMLDetailsElement).open) loadDetails(rec.id) }}>
                 <summary className="cursor-pointer">
                   <strong>#{rec.id}</strong> • {rec.job_title} • {rec.created_at}
                 </summary>
-                <div className="muted small mt-1">{rec.job_description}</div>
-                <div className="mt-2">
-                  <QACard qa={rec.qa} level={level} />
-                </div>
+                {details[rec.id] ? (
+                  <>
+                    <div className="muted small mt-1">{details[rec.id].job_description}</div>
+                    <div className="mt-2">
+                      <QACard qa={details[rec.id].qa} level={level} />
+                    </div>
+                  </>
+                ) : (
+                  <p className="muted small mt-1">Loading…</p>
+                )}
               </details>
             </li>
           ))}
@@ -102,8 +158,13 @@ function App() {
     }
     setLoading(true)
     try {
-      const data = await api.agent(jobTitle.trim(), jobDesc.trim())
-      setResult(data)
+      const qa: Record<LevelKey, Array<{question: string, answer: string}>> = { basic: [], intermediate: [], expert: [] }
+      setResult({ qa })
+      const done = await api.agentStream(jobTitle.trim(), jobDesc.trim(), (p) => {
+        qa[p.level] = [...qa[p.level], { question: p.question, answer: p.answer }]
+        setResult({ qa: { ...qa } })
+      })
+      setResult({ ...done, qa: { ...qa } })
     } catch (err: any) {
       setError(err.message || String(err))
     } finally {
@@ -9,6 +9,8 @@ export default defineConfig({
     proxy: {
       '/get': 'http://localhost:5000',
       '/agent': 'http://localhost:5000',
+      '/jobs': 'http://localhost:5000',
+      '/search': 'http://localhost:5000',
     }
   }
 })
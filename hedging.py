@@ -0,0 +1,140 @@
+"""Hedged model calls: bound tail latency with a backup request.
+
+`Hedger.run(primary, backup, deadline)` starts `primary`; if it has not returned
+a valid result after a delay derived from the recent p95 latency, `backup` is
+started as well and whichever returns a valid result first wins (the loser is
+left to finish in the background; its result is discarded). A primary failure
+starts the backup immediately. With hedging disabled the backup only runs as a
+fallback after the primary fails.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional, TypeVar
+
+from metrics import REGISTRY
+
+T = TypeVar("T")
+
+GENERATIONS = REGISTRY.counter("gemini_generations_total", "Generations attempted through the hedger")
+HEDGES = REGISTRY.counter("gemini_hedges_total", "Backup requests started because the primary was slow")
+HEDGE_RESULTS = REGISTRY.counter(
+    "gemini_hedge_results_total", "Which request won when a backup was started", ("winner",)
+)
+FALLBACKS = REGISTRY.counter("gemini_fallbacks_total", "Backup requests started because the primary failed")
+DEADLINES = REGISTRY.counter("gemini_deadline_exceeded_total", "Generations that ran out of time")
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left until a time.monotonic() deadline (None = unbounded)."""
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+class LatencyTracker:
+    """Sliding window of recent latencies for percentile estimates."""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float, min_samples: int = 20) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class Hedger:
+    def __init__(
+        self,
+        enabled: bool = False,
+        default_delay: float = 10.0,
+        min_delay: float = 1.0,
+        percentile: float = 0.95,
+        max_workers: int = 32,
+    ):
+        self.enabled = enabled
+        self._default_delay = default_delay
+        self._min_delay = min_delay
+        self._percentile = percentile
+        self.latency = LatencyTracker()
+        self._executor = (
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-hedge") if enabled else None
+        )
+
+    def delay(self) -> float:
+        """How long the primary may run before a backup is started."""
+        p = self.latency.percentile(self._percentile)
+        return self._default_delay if p is None else max(self._min_delay, p)
+
+    def run(
+        self,
+        primary: Callable[[], T],
+        backup: Optional[Callable[[], T]] = None,
+        deadline: Optional[float] = None,
+    ) -> T:
+        """Return the first valid result; raises TimeoutError once `deadline` passes."""
+        GENERATIONS.inc()
+        if backup is None or self._executor is None:
+            return self._run_sequential(primary, backup, deadline)
+
+        started = time.monotonic()
+        first = self._executor.submit(primary)
+        first.add_done_callback(lambda f: self._observe(f, started))
+        names: Dict[Future, str] = {first: "primary"}
+        pending = {first}
+        hedge_at = started + self.delay()
+        last_error: Optional[BaseException] = None
+
+        while True:
+            wake = [t for t in (None if len(names) > 1 else hedge_at, deadline) if t is not None]
+            timeout = max(0.0, min(wake) - time.monotonic()) if wake else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if len(names) > 1:
+                    HEDGE_RESULTS.inc(winner=names[future])
+                return result
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError("generation deadline exceeded")
+            if len(names) == 1 and (not pending or time.monotonic() >= hedge_at):
+                (FALLBACKS if not pending else HEDGES).inc()
+                second = self._executor.submit(backup)
+                names[second] = "backup"
+                pending.add(second)
+            elif not pending:
+                raise last_error
+
+    def _run_sequential(self, primary, backup, deadline):
+        started = time.monotonic()
+        try:
+            result = primary()
+        except Exception:
+            if backup is None or remaining(deadline) == 0:
+                raise
+            FALLBACKS.inc()
+            return backup()
+        self.latency.observe(time.monotonic() - started)
+        return result
+
+    def _observe(self, future: Future, started: float) -> None:
+        # Losing primaries are observed too, so slow calls still shape the p95
+        if not future.cancelled() and future.exception() is None:
+            self.latency.observe(time.monotonic() - started)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,90 @@
+"""Background execution of /agent requests (POST /agent?async=1).
+
+Job state lives in the `generation_jobs` table so any process can answer status
+polls; the work itself runs on a per-process thread pool. Jobs are not resumed
+by another process: `shutdown()` marks the ones it cannot finish as failed, so
+pollers are not left waiting on a job nobody runs.
+"""
+
+from __future__ import annotations
+
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, Optional
+
+from database import get_session
+from models import GenerationJob
+from records import request_deadline
+from scheduler import PRIORITY_BACKGROUND
+
+
+class JobRunner:
+    """Run `QuestionAgent.run` on a bounded worker pool and record progress in the DB."""
+
+    def __init__(self, agent_factory, max_workers: int = 4):
+        self._agents = agent_factory
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="agent-job")
+        # Queued or running jobs of this process
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job_title: str, job_description: str) -> str:
+        """Persist a pending job, queue it, and return its id."""
+        job_id = uuid.uuid4().hex
+        with get_session() as session:
+            session.add(GenerationJob(
+                id=job_id,
+                status="pending",
+                job_title=job_title,
+                job_description=job_description,
+            ))
+        future = self._executor.submit(self._run, job_id, job_title, job_description)
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda _: self._forget(job_id))
+        return job_id
+
+    def _forget(self, job_id: str) -> None:
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def _run(self, job_id: str, job_title: str, job_description: str) -> None:
+        self._update(job_id, status="running")
+        try:
+            # Queued behind interactive requests when the Gemini rate budget is tight; bounded
+            # by AGENT_TIMEOUT like /agent, so shutdown() does not wait on a stuck call
+            agent = self._agents.create(priority=PRIORITY_BACKGROUND)
+            result = agent.run(job_title, job_description, deadline=request_deadline(None, None))
+        except Exception as e:
+            self._update(job_id, status="failed", error=str(e))
+            return
+        # error=None: the job may have been marked failed by shutdown() meanwhile
+        self._update(job_id, status="succeeded", record_id=result["id"], error=None)
+
+    @staticmethod
+    def _update(job_id: str, **fields) -> None:
+        with get_session() as session:
+            job = session.get(GenerationJob, job_id)
+            if job is not None:
+                for name, value in fields.items():
+                    setattr(job, name, value)
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """Stop taking jobs and wait up to `timeout` seconds (None = no limit) for running ones.
+
+        Queued jobs are cancelled and marked failed at once; running jobs that do
+        not finish in time are marked failed as well.
+        """
+        with self._lock:
+            unfinished = dict(self._futures)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for job_id, future in unfinished.items():
+            if future.cancelled():
+                self._update(job_id, status="failed", error="server shut down before the job started")
+        running = [f for f in unfinished.values() if not f.cancelled()]
+        if running:
+            wait(running, timeout=timeout)
+        for job_id, future in unfinished.items():
+            if not future.done():
+                self._update(job_id, status="failed", error="server shut down before the job finished")
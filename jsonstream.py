@@ -0,0 +1,168 @@
+"""JSON parsing helpers for model output.
+
+`IncrementalQAParser` consumes text chunks of a document shaped like
+`{"basic": [{...}, ...], "intermediate": [...], "expert": [...]}` and emits each
+`{question, answer}` object as soon as its closing brace arrives, without waiting
+for the rest of the document. Leading prose or code fences are skipped (the
+document starts at the first `{"` or `[{`, as in `extract_json`), and a bare
+top-level array is treated as the "basic" level (mirroring `generate_qa`).
+
+`extract_json` finds the first complete top-level JSON object or array in a full
+response that also contains prose, code fences or trailing junk.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+LEVELS = ("basic", "intermediate", "expert")
+
+# Where a Q&A document can start: an object with a string key or an array of objects.
+# Brackets in prose ("{role}", "[1]") never match, so they cost no parse attempt.
+_CANDIDATE = re.compile(r'\{\s*"|\[\s*\{')
+# Failed parses allowed before giving up; each costs O(n), so this keeps the total linear
+_MAX_ATTEMPTS = 64
+_DECODER = json.JSONDecoder()
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"')
+_WHITESPACE = " \t\r\n"
+
+
+def extract_json(text: str):
+    """Return the first complete top-level JSON object or array embedded in `text`.
+
+    Candidates are parsed in place by the C JSON scanner. The scanner balances
+    brackets and handles string literals and escapes, so trailing prose, fences
+    or a second document are ignored. When a candidate fails, the text before
+    the error position was a valid JSON prefix, so a candidate in its structure
+    is nested and not worth trying. A candidate inside one of its string literals
+    may be the real document, though: in `Use {" as the opener: {"basic": ...}`
+    the bogus first key swallows the real opener. Scanning resumes at the first
+    such candidate, or at the error position when there is none.
+    Raises ValueError when no complete value exists, e.g. a truncated response.
+    """
+    pos = 0
+    for _ in range(_MAX_ATTEMPTS):
+        candidate = _CANDIDATE.search(text, pos)
+        if candidate is None:
+            break
+        try:
+            return _DECODER.raw_decode(text, candidate.start())[0]
+        except json.JSONDecodeError as e:
+            if e.msg.startswith("Unterminated string"):
+                # No closing quote follows, so no later document can be complete
+                raise ValueError("truncated JSON in model output") from None
+            pos = _resume_position(text, candidate.start(), max(candidate.start() + 1, e.pos))
+    raise ValueError("no complete JSON object or array in model output")
+
+
+def _resume_position(text: str, start: int, end: int) -> int:
+    """First candidate start inside a string literal of the valid prefix text[start:end], else `end`."""
+    # In a valid JSON prefix every quote outside a string opens one, so this finds the literals exactly
+    for literal in _STRING.finditer(text, start, end):
+        # endpos includes the closing quote: it may be the `"` of a swallowed `{"`
+        nested = _CANDIDATE.search(text, literal.start() + 1, literal.end())
+        if nested is not None:
+            return nested.start()
+    return end
+
+
+class IncrementalQAParser:
+    """Character-level scanner that tracks nesting and string state across chunks."""
+
+    def __init__(self, levels: Sequence[str] = LEVELS):
+        self._levels = tuple(levels)
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        # Text of the string currently being read at the top level (a candidate key)
+        self._key_chars: Optional[List[str]] = None
+        self._last_string: Optional[str] = None
+        self._level: Optional[str] = None
+        # Raw text of the object being captured and the depth of its enclosing array
+        self._capture: Optional[List[str]] = None
+        self._capture_depth = 0
+        # "{" or "[" seen before the document, kept until the next character shows
+        # whether it starts a candidate (`{"` / `[{`) or is prose such as "{role}"
+        self._opener: Optional[str] = None
+        self.done = False
+
+    def feed(self, text: str) -> List[Tuple[str, Dict]]:
+        """Consume a chunk and return the (level, object) pairs it completed."""
+        out: List[Tuple[str, Dict]] = []
+        for ch in text:
+            if self.done:
+                break
+            if self._opener is not None:
+                if ch in _WHITESPACE:
+                    continue
+                opener, self._opener = self._opener, None
+                # Same anchor as extract_json's _CANDIDATE: `{"` or `[{`, so "{role}" in prose is skipped
+                if (opener == "{" and ch == '"') or (opener == "[" and ch == "{"):
+                    self._consume(opener, out)
+            if not self._stack and ch in "{[":
+                # Possible document start; decided by the next non-whitespace character
+                self._opener = ch
+                continue
+            self._consume(ch, out)
+        return out
+
+    def _consume(self, ch: str, out: List[Tuple[str, Dict]]) -> None:
+        if self._capture is not None:
+            self._capture.append(ch)
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._key_chars is not None:
+                    self._last_string = "".join(self._key_chars)
+                    self._key_chars = None
+                return
+            if self._key_chars is not None:
+                self._key_chars.append(ch)
+            return
+
+        if not self._stack and ch not in "{[":
+            # Prose or fences before the document starts
+            return
+
+        if ch == '"':
+            self._in_string = True
+            if self._stack == ["{"]:
+                self._key_chars = []
+        elif ch == ":" and self._stack == ["{"]:
+            self._level = self._last_string
+        elif ch in "{[":
+            if not self._stack and ch == "[":
+                self._level = "basic"
+            if ch == "{" and self._capture is None and self._in_level_array():
+                self._capture = ["{"]
+                self._capture_depth = len(self._stack)
+            self._stack.append(ch)
+        elif ch in "}]":
+            self._stack.pop()
+            if self._capture is not None and len(self._stack) == self._capture_depth:
+                obj = self._finish_capture()
+                if obj is not None:
+                    out.append((self._level, obj))
+            if not self._stack:
+                self.done = True
+
+    def _in_level_array(self) -> bool:
+        if self._level not in self._levels:
+            return False
+        return self._stack == ["{", "["] or self._stack == ["["]
+
+    def _finish_capture(self) -> Optional[Dict]:
+        raw = "".join(self._capture or [])
+        self._capture = None
+        try:
+            obj = json.loads(raw)
+        except ValueError:
+            return None
+        return obj if isinstance(obj, dict) else None
@@ -0,0 +1,129 @@
+"""Maintenance commands for the interview agent database.
+
+Usage:
+    python manage.py init-db
+    python manage.py compact-questions [--batch-size 1000]
+    python manage.py expand-questions [--batch-size 1000]
+    python manage.py backfill-qa-pairs [--batch-size 1000]
+    python manage.py rebuild-search-index
+
+compact-questions migrates existing rows to QUESTIONS_STORAGE=derived: the flat
+`questions` list is cleared (replaced by the derive marker) wherever it can be
+rebuilt exactly from `qa`. expand-questions reverses it, e.g. before switching
+back to QUESTIONS_STORAGE=duplicate. backfill-qa-pairs fills
+`interview_qa_pairs` for records saved before that table existed (new pairs are
+indexed for /search as they are inserted). rebuild-search-index re-indexes every
+pair from scratch (SQLite FTS5). All commands are safe to re-run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+
+from sqlalchemy import exists, insert, update
+
+from database import engine, init_db, get_session
+from models import InterviewQuestion, QAPair
+from records import DERIVED_QUESTIONS, derive_questions, loads_or_none, qa_pair_rows
+from search import rebuild_search_index
+
+
+def _batches(batch_size: int, *filters):
+    """Yield lists of (id, questions, qa) rows matching filters, in id order."""
+    last_id = 0
+    while True:
+        with get_session() as session:
+            rows = (
+                session.query(InterviewQuestion.id, InterviewQuestion.questions, InterviewQuestion.qa)
+                .filter(InterviewQuestion.id > last_id, *filters)
+                .order_by(InterviewQuestion.id)
+                .limit(batch_size)
+                .all()
+            )
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield rows
+
+
+def compact_questions(batch_size: int = 1000) -> int:
+    """Replace `questions` with the derive marker where it matches `qa`; returns rows changed."""
+    changed = 0
+    for rows in _batches(
+        batch_size,
+        InterviewQuestion.questions != DERIVED_QUESTIONS,
+        InterviewQuestion.qa.isnot(None),
+    ):
+        ids = []
+        for row in rows:
+            try:
+                stored = json.loads(row.questions)
+            except Exception:
+                continue
+            # Only compact rows whose list is exactly reproducible from qa
+            if stored == derive_questions(row.qa):
+                ids.append(row.id)
+        if ids:
+            with get_session() as session:
+                session.execute(
+                    update(InterviewQuestion)
+                    .where(InterviewQuestion.id.in_(ids))
+                    .values(questions=DERIVED_QUESTIONS)
+                )
+            changed += len(ids)
+    return changed
+
+
+def expand_questions(batch_size: int = 1000) -> int:
+    """Materialize the flat `questions` list for compacted rows; returns rows changed."""
+    changed = 0
+    for rows in _batches(batch_size, InterviewQuestion.questions == DERIVED_QUESTIONS):
+        with get_session() as session:
+            for row in rows:
+                session.execute(
+                    update(InterviewQuestion)
+                    .where(InterviewQuestion.id == row.id)
+                    .values(questions=json.dumps(derive_questions(row.qa), ensure_ascii=False))
+                )
+        changed += len(rows)
+    return changed
+
+
+def backfill_qa_pairs(batch_size: int = 1000) -> int:
+    """Insert pair rows for records that have `qa` but no pairs yet; returns records filled."""
+    has_pairs = exists().where(QAPair.record_id == InterviewQuestion.id)
+    filled = 0
+    for rows in _batches(batch_size, InterviewQuestion.qa.isnot(None), ~has_pairs):
+        pair_rows = [p for row in rows for p in qa_pair_rows(row.id, loads_or_none(row.qa))]
+        if pair_rows:
+            with get_session() as session:
+                session.execute(insert(QAPair), pair_rows)
+        filled += len({p["record_id"] for p in pair_rows})
+    return filled
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("init-db", help="create tables and run lightweight migrations")
+    sub.add_parser("rebuild-search-index", help="re-index all Q&A pairs for /search")
+    for name in ("compact-questions", "expand-questions", "backfill-qa-pairs"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "compact-questions":
+        print(f"compacted {compact_questions(args.batch_size)} rows")
+    elif args.command == "expand-questions":
+        print(f"expanded {expand_questions(args.batch_size)} rows")
+    elif args.command == "backfill-qa-pairs":
+        print(f"backfilled pairs for {backfill_qa_pairs(args.batch_size)} records")
+    elif args.command == "rebuild-search-index":
+        rebuild_search_index(engine)
+        print("search index rebuilt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""In-process metrics exposed in the Prometheus text format (GET /metrics).
+
+Metrics are module-level objects registered in `REGISTRY`; updating one is a
+dict update under a lock, and text is only rendered when /metrics is scraped.
+Values are per process. Counters count events; histograms record durations
+(seconds) or sizes in fixed buckets.
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# Seconds; wide enough for both SQL round-trips and multi-second model calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0)]
+        return [(self.name, _label_text(self.labelnames, key), value) for key, value in items]
+
+
+class Histogram:
+    """Cumulative histogram with fixed upper bounds, optionally split by labels.
+
+    `observe` is a bisect plus a few additions under a lock; buckets are only
+    accumulated into the cumulative `le` form when rendered.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the wall time of the block (also when it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            return sum(entry[0]) if entry else 0
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            items = sorted((key, list(counts), total) for key, (counts, total) in self._values.items())
+        if not items and not self.labelnames:
+            items = [((), [0] * (len(self.buckets) + 1), 0.0)]
+        names = self.labelnames + ("le",)
+        out: List[Tuple[str, str, float]] = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                out.append((f"{self.name}_bucket", _label_text(names, key + (le,)), cumulative))
+            labels = _label_text(self.labelnames, key)
+            out.append((f"{self.name}_sum", labels, total))
+            out.append((f"{self.name}_count", labels, cumulative))
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Counter | Histogram] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.setdefault(metric.name, metric)
+            return self._metrics[metric.name]
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
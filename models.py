@@ -5,7 +5,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import List
 
-from sqlalchemy import String, Text, DateTime, func
+from sqlalchemy import String, Text, DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from database import Base
@@ -13,6 +13,12 @@ from database import Base
 
 class InterviewQuestion(Base):
     __tablename__ = "interview_questions"
+    __table_args__ = (
+        # GET /get filters on job_title and orders/seeks on id
+        Index("ix_interview_questions_job_title_id", "job_title", "id"),
+        Index("ix_interview_questions_created_at", "created_at"),
+        Index("ix_interview_questions_batch_id", "batch_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     job_title: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -21,6 +27,10 @@ class InterviewQuestion(Base):
     questions: Mapped[str] = mapped_column(Text, nullable=False)
     # Optional: store Q&A pairs as JSON string: [{"question": str, "answer": str}, ...]
     qa: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Content hash of the generation request (see cache.make_cache_key)
+    cache_key: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+    # Set by bulk inserts (POST /agent/batch) to read the new ids back in one query
+    batch_id: Mapped[str | None] = mapped_column(String(32), nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
@@ -34,3 +44,56 @@ class InterviewQuestion(Base):
             "questions": self.questions,  # caller may json.loads
             "created_at": self.created_at.isoformat() if self.created_at else None,
         }
+
+
+class QAPair(Base):
+    """One Q&A pair of a record, so a single level can be read without the `qa` blob."""
+
+    __tablename__ = "interview_qa_pairs"
+    __table_args__ = (
+        # Serves "all pairs of one level of one record, in order"
+        Index("ix_interview_qa_pairs_record_level", "record_id", "level", "position"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    record_id: Mapped[int] = mapped_column(
+        ForeignKey("interview_questions.id", ondelete="CASCADE"), nullable=False
+    )
+    # basic | intermediate | expert
+    level: Mapped[str] = mapped_column(String(16), nullable=False)
+    position: Mapped[int] = mapped_column(nullable=False)
+    question: Mapped[str] = mapped_column(Text, nullable=False)
+    answer: Mapped[str] = mapped_column(Text, nullable=False)
+
+
+class GenerationJob(Base):
+    """Asynchronous /agent request; polled via GET /jobs/<id> from any process."""
+
+    __tablename__ = "generation_jobs"
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    # pending | running | succeeded | failed
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="pending")
+    job_title: Mapped[str] = mapped_column(String(255), nullable=False)
+    job_description: Mapped[str] = mapped_column(Text, nullable=False)
+    record_id: Mapped[int | None] = mapped_column(ForeignKey("interview_questions.id"), nullable=True)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+
+class GenerationLease(Base):
+    """Cross-process single-flight lease for one generation request (see singleflight.py)."""
+
+    __tablename__ = "generation_leases"
+
+    # cache key of the request (cache.make_cache_key)
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    owner: Mapped[str] = mapped_column(String(32), nullable=False)
+    # Naive UTC; the leader's record is published in record_id when done
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    record_id: Mapped[int | None] = mapped_column(nullable=True)
@@ -0,0 +1,223 @@
+"""Storage format and API shape of saved records, shared by both apps and manage.py.
+
+The Flask app (app.py), the ASGI app (asgi.py) and the maintenance commands
+(manage.py) write and read `interview_questions` rows through these helpers, so
+every entry point stores and returns identical records: JSON column encoding,
+pair rows, `/get` projections, cursors and the request deadline.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import math
+import time
+from typing import List
+
+from sqlalchemy import select
+
+from agent import flatten_questions
+from config import settings
+from jsonstream import LEVELS
+from models import InterviewQuestion
+
+
+# Columns a /get listing may project; `id` is always included (it is the cursor)
+RECORD_FIELDS = ("id", "job_title", "job_description", "questions", "qa", "created_at")
+SUMMARY_FIELDS = ("id", "job_title", "created_at")
+
+# Stored in `questions` when QUESTIONS_STORAGE=derived: the list is rebuilt from `qa`
+DERIVED_QUESTIONS = ""
+
+
+def isoformat(value) -> str | None:
+    return value.isoformat() if value is not None else None
+
+
+def encode_cursor(last_id: int) -> str:
+    """Opaque pagination cursor for GET /get (base64 of the last row id)."""
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Inverse of `encode_cursor`; raises ValueError for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except Exception:
+        raise ValueError("invalid cursor")
+    prefix, _, value = raw.partition(":")
+    if prefix != "id":
+        raise ValueError("invalid cursor")
+    return int(value)
+
+
+def encode_payload(questions: List[str], qa: dict | List[dict] | None) -> tuple:
+    """Validate and serialize the JSON columns of a record.
+
+    This is the only place these columns are written, which is what lets the read
+    path splice them into responses without decoding. Raises ValueError on bad shapes.
+    """
+    if not isinstance(questions, list) or not all(isinstance(q, str) for q in questions):
+        raise ValueError("questions must be a list of strings")
+    if qa is not None:
+        pairs = qa if isinstance(qa, list) else qa.values() if isinstance(qa, dict) else None
+        if pairs is None:
+            raise ValueError("qa must be a list or a dict of levels")
+        if isinstance(qa, dict) and not all(isinstance(v, list) for v in pairs):
+            raise ValueError("qa levels must be lists")
+    # allow_nan=False guarantees strict JSON that any client can parse
+    qa_json = json.dumps(qa, ensure_ascii=False, allow_nan=False) if qa is not None else None
+    if qa_json is not None and settings.questions_storage == "derived":
+        # Stored once in `qa`; the empty marker tells readers to derive the flat list
+        questions_json = DERIVED_QUESTIONS
+    else:
+        questions_json = json.dumps(questions, ensure_ascii=False, allow_nan=False)
+    return questions_json, qa_json
+
+
+def qa_pair_rows(record_id: int, qa: dict | List[dict] | None) -> List[dict]:
+    """Rows for `interview_qa_pairs`, one per {question, answer} pair of `qa`."""
+    if isinstance(qa, list):
+        qa = {"basic": qa}
+    if not isinstance(qa, dict):
+        return []
+    rows = []
+    for level in LEVELS:
+        pairs = [x for x in qa.get(level) or [] if isinstance(x, dict) and "question" in x and "answer" in x]
+        for position, pair in enumerate(pairs):
+            rows.append({
+                "record_id": record_id,
+                "level": level,
+                "position": position,
+                "question": str(pair["question"]),
+                "answer": str(pair["answer"]),
+            })
+    return rows
+
+
+def loads_or_none(text: str | None):
+    try:
+        return json.loads(text) if text else None
+    except Exception:
+        return None
+
+
+def derive_questions(qa_text: str | None) -> List[str]:
+    """Rebuild the flat `questions` list from a stored `qa` JSON document."""
+    qa = loads_or_none(qa_text)
+    return flatten_questions(qa) if isinstance(qa, (dict, list)) else []
+
+
+def select_columns(fields: tuple) -> list:
+    """Columns needed to render `fields`."""
+    return [getattr(InterviewQuestion, name) for name in fields]
+
+
+def derived_qa_statement(rows, fields: tuple):
+    """Query for the `qa` of projected rows whose `questions` is derived, or None.
+
+    `qa` is only fetched for those rows (QUESTIONS_STORAGE=derived), so a
+    `fields=questions` listing of inline rows never reads the `qa` column.
+    """
+    if "questions" not in fields or "qa" in fields:
+        return None
+    ids = [r.id for r in rows if r.questions == DERIVED_QUESTIONS]
+    if not ids:
+        return None
+    return select(InterviewQuestion.id, InterviewQuestion.qa).where(InterviewQuestion.id.in_(ids))
+
+
+def record_json(r, fields: tuple = RECORD_FIELDS, derived_qa: dict | None = None) -> str:
+    """Encode a stored row as a JSON object, splicing the stored JSON columns verbatim.
+
+    Unlike `serialize_record` this never decodes `questions`/`qa`, so CPU cost grows
+    with the number of rows rather than with the size of the Q&A trees. derived_qa
+    maps id -> `qa` for rows selected without it (see `derived_qa_statement`).
+    """
+    parts = []
+    for name in fields:
+        if name == "questions":
+            if r.questions == DERIVED_QUESTIONS:
+                qa_text = r.qa if derived_qa is None else derived_qa.get(r.id)
+                value = json.dumps(derive_questions(qa_text), ensure_ascii=False)
+            else:
+                value = r.questions or "[]"
+        elif name == "qa":
+            value = r.qa or "null"
+        elif name == "created_at":
+            value = json.dumps(isoformat(getattr(r, "created_at", None)))
+        else:
+            value = json.dumps(getattr(r, name), ensure_ascii=False)
+        parts.append(f'"{name}":{value}')
+    return "{" + ",".join(parts) + "}"
+
+
+def parse_fields(view: str | None, fields: str | None) -> tuple:
+    """Resolve `?view=` / `?fields=` into an ordered tuple of record fields.
+
+    Raises ValueError for unknown views or fields.
+    """
+    if fields:
+        wanted = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = wanted - set(RECORD_FIELDS)
+        if unknown:
+            raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+        wanted.add("id")
+        return tuple(f for f in RECORD_FIELDS if f in wanted)
+    if view in (None, "", "full"):
+        return RECORD_FIELDS
+    if view == "summary":
+        return SUMMARY_FIELDS
+    raise ValueError(f"unknown view: {view}")
+
+
+def request_deadline(header: str | None, param: str | None) -> float | None:
+    """time.monotonic() deadline for a generation request.
+
+    `X-Request-Timeout` / `?timeout=` (seconds) can shorten, not extend, AGENT_TIMEOUT.
+    Raises ValueError for a non-positive, non-finite or non-numeric timeout.
+    """
+    timeout = settings.agent_timeout if settings.agent_timeout > 0 else None
+    requested = header or param
+    if requested:
+        try:
+            value = float(requested)
+        except ValueError:
+            raise ValueError("timeout must be a number of seconds")
+        if not value > 0:
+            raise ValueError("timeout must be positive")
+        if not math.isfinite(value):
+            raise ValueError("timeout must be finite")
+        timeout = value if timeout is None else min(timeout, value)
+    return time.monotonic() + timeout if timeout is not None else None
+
+
+def serialize_record(r, fields: tuple = RECORD_FIELDS) -> dict:
+    """Convert a stored row (ORM object or column row) into the API shape.
+
+    Only `fields` are read, so rows selected with a column projection never touch
+    the heavy columns; JSON columns are decoded.
+    """
+    item = {}
+    for name in fields:
+        if name == "questions":
+            if r.questions == DERIVED_QUESTIONS:
+                item[name] = derive_questions(r.qa)
+                continue
+            try:
+                item[name] = json.loads(r.questions)
+            except Exception:
+                item[name] = []
+        elif name == "qa":
+            qa_list = None
+            if r.qa:
+                try:
+                    qa_list = json.loads(r.qa)
+                except Exception:
+                    qa_list = None
+            item[name] = qa_list
+        elif name == "created_at":
+            item[name] = isoformat(getattr(r, "created_at", None))
+        else:
+            item[name] = getattr(r, name)
+    return item
@@ -0,0 +1,376 @@
+"""Rate-limit-aware scheduling of Gemini calls.
+
+Every model call goes through `ModelCallScheduler.call`, which:
+- paces calls with token buckets for requests-per-minute and tokens-per-minute
+  (budgets are per process; divide the provider quota by the process count),
+- admits waiting calls in priority order (lower value first, FIFO within one),
+- retries retryable errors (429, 5xx, timeouts) with full-jitter exponential
+  backoff, honouring Retry-After when the provider sends it,
+- trips a circuit breaker after consecutive retryable failures so that, while
+  the provider is down, requests fail fast instead of piling up.
+
+`acall` is the same for coroutines (the ASGI app): waiting calls sleep on the
+event loop instead of blocking a thread.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+_RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+_RETRYABLE_MARKERS = ("RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED", "INTERNAL")
+# How often async waiters that are not first in line re-check the queue
+_ASYNC_POLL = 0.05
+
+_RETRYABLE_TYPES = {"TimeoutException", "ConnectTimeout", "ReadTimeout", "ConnectError", "RemoteProtocolError"}
+
+
+class SchedulerError(Exception):
+    """Raised when a call is rejected by the scheduler itself (queue timeout, open circuit).
+
+    Raised from inside a scheduled `fn`, it means the call never reached the
+    provider: it is neither retried nor counted by the circuit breaker.
+    """
+
+
+class CircuitOpenError(SchedulerError):
+    pass
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an SDK/transport error is worth retrying (quota, overload, timeouts)."""
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(code, int) and code in _RETRYABLE_STATUS:
+        return True
+    if type(error).__name__ in _RETRYABLE_TYPES:
+        return True
+    message = str(error)
+    return any(marker in message for marker in _RETRYABLE_MARKERS)
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        value = headers.get("retry-after") if headers is not None else None
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Continuously refilling bucket; `rate_per_minute <= 0` means unlimited.
+
+    Not thread-safe on its own; the scheduler serializes access.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (0 if available now)."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self._tokens >= amount else (amount - self._tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        if self.rate > 0:
+            self._tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta: float) -> None:
+        """Return (positive) or charge (negative) tokens after the real cost is known."""
+        if self.rate > 0:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + delta)
+
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures; one trial call after `reset_timeout`."""
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30.0):
+        self._threshold = threshold
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._open_until = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._failures < self._threshold or self._threshold <= 0:
+                return "closed"
+            return "open" if time.monotonic() < self._open_until else "half_open"
+
+    def allow(self) -> bool:
+        if self._threshold <= 0:
+            return True
+        with self._lock:
+            if self._failures < self._threshold:
+                return True
+            if time.monotonic() < self._open_until or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def retry_in(self) -> float:
+        return max(0.0, self._open_until - time.monotonic())
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Give up a half-open trial slot without recording an outcome."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._threshold > 0 and self._failures >= self._threshold:
+                self._open_until = time.monotonic() + self._reset_timeout
+
+
+class ModelCallScheduler:
+    """Admission control, retries and circuit breaking around model calls."""
+
+    def __init__(
+        self,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        breaker_threshold: int = 5,
+        breaker_reset: float = 30.0,
+        queue_timeout: float = 60.0,
+    ):
+        self._rpm = TokenBucket(requests_per_minute)
+        self._tpm = TokenBucket(tokens_per_minute)
+        self._max_retries = max(0, max_retries)
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._queue_timeout = queue_timeout
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        self._queue: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_settings(cls, settings) -> "ModelCallScheduler":
+        return cls(
+            requests_per_minute=settings.gemini_rpm,
+            tokens_per_minute=settings.gemini_tpm,
+            max_retries=settings.gemini_max_retries,
+            backoff_base=settings.gemini_backoff_base,
+            backoff_max=settings.gemini_backoff_max,
+            breaker_threshold=settings.gemini_breaker_threshold,
+            breaker_reset=settings.gemini_breaker_reset,
+            queue_timeout=settings.gemini_queue_timeout,
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    def _acquire(self, priority: int, tokens: float, call_deadline: Optional[float] = None) -> None:
+        """Block until this call is first in line and both buckets allow it."""
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Gemini circuit breaker open; retry in {self.breaker.retry_in():.0f}s")
+        deadline = time.monotonic() + self._queue_timeout
+        if call_deadline is not None and call_deadline < deadline:
+            deadline = call_deadline
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    wait: Optional[float] = None
+                    if self._queue[0] == ticket:
+                        wait = max(self._rpm.wait_time(1), self._tpm.wait_time(tokens))
+                        if wait <= 0:
+                            self._rpm.take(1)
+                            self._tpm.take(tokens)
+                            return
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.breaker.release_trial()
+                        if deadline == call_deadline:
+                            raise TimeoutError("deadline exceeded while waiting for the Gemini rate limit")
+                        raise SchedulerError("Gemini rate limit queue timed out")
+                    self._cond.wait(timeout=min(wait, remaining) if wait is not None else remaining)
+            finally:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+    async def _acquire_async(self, priority: int, tokens: float, call_deadline: Optional[float] = None) -> None:
+        """`_acquire` for coroutines: same queue and buckets, but waits with asyncio.sleep."""
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Gemini circuit breaker open; retry in {self.breaker.retry_in():.0f}s")
+        deadline = time.monotonic() + self._queue_timeout
+        if call_deadline is not None and call_deadline < deadline:
+            deadline = call_deadline
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+        try:
+            while True:
+                wait = _ASYNC_POLL
+                # The lock is only held for the bucket arithmetic, never across an await
+                with self._cond:
+                    if self._queue[0] == ticket:
+                        wait = max(self._rpm.wait_time(1), self._tpm.wait_time(tokens))
+                        if wait <= 0:
+                            self._rpm.take(1)
+                            self._tpm.take(tokens)
+                            return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.breaker.release_trial()
+                    if deadline == call_deadline:
+                        raise TimeoutError("deadline exceeded while waiting for the Gemini rate limit")
+                    raise SchedulerError("Gemini rate limit queue timed out")
+                await asyncio.sleep(min(wait, remaining))
+        finally:
+            with self._cond:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        hinted = _retry_after(error)
+        if hinted is not None:
+            return min(hinted, self._backoff_max)
+        # Full jitter: spreads retries so clients do not synchronize into new bursts
+        return random.uniform(0, min(self._backoff_max, self._backoff_base * (2 ** attempt)))
+
+    def call(
+        self,
+        fn: Callable[[], T],
+        priority: int = PRIORITY_INTERACTIVE,
+        estimated_tokens: float = 0,
+        usage: Optional[Callable[[T], Optional[int]]] = None,
+        deadline: Optional[float] = None,
+    ) -> T:
+        """Run `fn` under the rate budgets, retrying retryable failures.
+
+        usage(result) may report the real token count so the TPM bucket is corrected.
+        deadline (time.monotonic()) bounds queueing and retries; past it, TimeoutError.
+        """
+        attempt = 0
+        while True:
+            self._acquire(priority, estimated_tokens, deadline)
+            try:
+                result = fn()
+            except SchedulerError:
+                # Rejected locally (e.g. the concurrency cap) before reaching the provider: no outcome
+                self.breaker.release_trial()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    # The provider answered; this is not an availability problem
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self._max_retries:
+                    raise
+                pause = self._backoff(attempt, e)
+                if deadline is not None and time.monotonic() + pause >= deadline:
+                    raise
+                time.sleep(pause)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            actual = usage(result) if usage is not None else None
+            if actual:
+                with self._cond:
+                    self._tpm.adjust(estimated_tokens - actual)
+            return result
+
+    async def acall(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        priority: int = PRIORITY_INTERACTIVE,
+        estimated_tokens: float = 0,
+        usage: Optional[Callable[[T], Optional[int]]] = None,
+        deadline: Optional[float] = None,
+    ) -> T:
+        """`call` for coroutine functions; same budgets, retries and breaker."""
+        attempt = 0
+        while True:
+            await self._acquire_async(priority, estimated_tokens, deadline)
+            try:
+                result = await fn()
+            except SchedulerError:
+                # Rejected locally (e.g. the concurrency cap) before reaching the provider: no outcome
+                self.breaker.release_trial()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self._max_retries:
+                    raise
+                pause = self._backoff(attempt, e)
+                if deadline is not None and time.monotonic() + pause >= deadline:
+                    raise
+                await asyncio.sleep(pause)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            actual = usage(result) if usage is not None else None
+            if actual:
+                with self._cond:
+                    self._tpm.adjust(estimated_tokens - actual)
+            return result
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_INTERACTIVE, estimated_tokens: float = 0) -> Iterator[None]:
+        """Admission and breaker accounting for calls that cannot be retried (streams)."""
+        self._acquire(priority, estimated_tokens)
+        outcome = "success"
+        try:
+            yield
+        except SchedulerError:
+            # Rejected locally (e.g. the concurrency cap) before reaching the provider: no outcome
+            outcome = None
+            raise
+        except Exception as e:
+            if is_retryable(e):
+                outcome = "failure"
+            raise
+        finally:
+            # Also runs when a consumer abandons the stream, so a half-open trial is released
+            if outcome is None:
+                self.breaker.release_trial()
+            elif outcome == "failure":
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
@@ -0,0 +1,173 @@
+"""Full-text search over saved Q&A pairs (GET /search).
+
+Backed by a real index on `interview_qa_pairs`:
+- SQLite: an external-content FTS5 table kept in sync by triggers, so every pair
+  written by `_save_record` is indexed in the same transaction; ranked by bm25.
+- MySQL: a FULLTEXT index on (question, answer), ranked by MATCH ... AGAINST.
+Other databases (or SQLite builds without FTS5) fall back to an unranked LIKE
+scan, which is correct but does not scale.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import List, Optional
+
+from sqlalchemy import text
+
+FTS_TABLE = "interview_qa_pairs_fts"
+FULLTEXT_INDEX = "ft_interview_qa_pairs_text"
+HIGHLIGHT = ("**", "**")
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+_SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    "question, answer, content='interview_qa_pairs', content_rowid='id')",
+    f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON interview_qa_pairs BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, question, answer) VALUES (new.id, new.question, new.answer); END",
+    f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON interview_qa_pairs BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, question, answer) "
+    "VALUES ('delete', old.id, old.question, old.answer); END",
+    f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON interview_qa_pairs BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, question, answer) "
+    "VALUES ('delete', old.id, old.question, old.answer); "
+    f"INSERT INTO {FTS_TABLE}(rowid, question, answer) VALUES (new.id, new.question, new.answer); END",
+]
+
+
+def search_terms(query: str) -> List[str]:
+    """Split user input into plain word terms (drops FTS operators and punctuation)."""
+    return _TERM.findall(query or "")
+
+
+def ensure_search_index(engine) -> None:
+    """Create the dialect's full-text index if missing; called by `init_db()`."""
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE},
+            ).first()
+            if exists:
+                return
+            for ddl in _SQLITE_DDL:
+                conn.execute(text(ddl))
+            # Index pairs written before the FTS table existed
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    elif engine.dialect.name == "mysql":
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text(f"SHOW INDEX FROM interview_qa_pairs WHERE Key_name = '{FULLTEXT_INDEX}'")
+            ).first()
+            if not exists:
+                conn.execute(text(
+                    f"ALTER TABLE interview_qa_pairs ADD FULLTEXT INDEX {FULLTEXT_INDEX} (question, answer)"
+                ))
+
+
+def rebuild_search_index(engine) -> None:
+    """Re-index every pair (SQLite FTS5 only; MySQL maintains FULLTEXT itself)."""
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def make_snippet(value: str, terms: List[str], width: int = 160) -> str:
+    """Highlight terms in a window of `value` around the first match."""
+    lowered = value.lower()
+    hits = [lowered.find(t.lower()) for t in terms]
+    hits = [h for h in hits if h >= 0]
+    start = max(0, min(hits) - width // 3) if hits else 0
+    window = value[start:start + width]
+    pattern = re.compile("|".join(re.escape(t) for t in terms), re.IGNORECASE) if terms else None
+    if pattern is not None:
+        window = pattern.sub(lambda m: f"{HIGHLIGHT[0]}{m.group(0)}{HIGHLIGHT[1]}", window)
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if start + width < len(value) else ""
+    return f"{prefix}{window}{suffix}"
+
+
+class SearchIndex:
+    """Runs ranked searches with the best strategy available for the engine."""
+
+    def __init__(self, engine):
+        self._engine = engine
+        self._fts: Optional[bool] = None
+
+    def _has_fts(self, session) -> bool:
+        if self._fts is None:
+            dialect = self._engine.dialect.name
+            if dialect == "sqlite":
+                self._fts = session.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {"name": FTS_TABLE},
+                ).first() is not None
+            elif dialect == "mysql":
+                self._fts = session.execute(
+                    text(f"SHOW INDEX FROM interview_qa_pairs WHERE Key_name = '{FULLTEXT_INDEX}'")
+                ).first() is not None
+            else:
+                self._fts = False
+        return self._fts
+
+    def search(self, session, query: str, limit: int = 20, level: Optional[str] = None) -> List[dict]:
+        """Return up to `limit` pairs matching all terms of `query`, best first."""
+        terms = search_terms(query)
+        if not terms:
+            return []
+        params = {"limit": limit, "level": level}
+        level_sql = " AND p.level = :level" if level else ""
+        dialect = self._engine.dialect.name
+
+        if dialect == "sqlite" and self._has_fts(session):
+            params["match"] = " ".join('"' + t.replace('"', "") + '"' for t in terms)
+            rows = session.execute(text(
+                "SELECT p.id, p.record_id, p.level, r.job_title, "
+                f"snippet({FTS_TABLE}, 0, '{HIGHLIGHT[0]}', '{HIGHLIGHT[1]}', '…', 16) AS question, "
+                f"snippet({FTS_TABLE}, 1, '{HIGHLIGHT[0]}', '{HIGHLIGHT[1]}', '…', 24) AS answer, "
+                f"-bm25({FTS_TABLE}) AS score "
+                f"FROM {FTS_TABLE} "
+                f"JOIN interview_qa_pairs p ON p.id = {FTS_TABLE}.rowid "
+                "JOIN interview_questions r ON r.id = p.record_id "
+                f"WHERE {FTS_TABLE} MATCH :match{level_sql} "
+                f"ORDER BY bm25({FTS_TABLE}) LIMIT :limit"
+            ), params).all()
+            return [self._result(row, row.question, row.answer) for row in rows]
+
+        if dialect == "mysql" and self._has_fts(session):
+            # Boolean mode with +term requires every term, like the SQLite path
+            params["match"] = " ".join(f"+{t}" for t in terms)
+            rows = session.execute(text(
+                "SELECT p.id, p.record_id, p.level, r.job_title, p.question, p.answer, "
+                "MATCH(p.question, p.answer) AGAINST (:match IN BOOLEAN MODE) AS score "
+                "FROM interview_qa_pairs p JOIN interview_questions r ON r.id = p.record_id "
+                f"WHERE MATCH(p.question, p.answer) AGAINST (:match IN BOOLEAN MODE){level_sql} "
+                "ORDER BY score DESC LIMIT :limit"
+            ), params).all()
+        else:
+            clauses = []
+            for i, term in enumerate(terms):
+                params[f"t{i}"] = f"%{term}%"
+                clauses.append(f"(p.question LIKE :t{i} OR p.answer LIKE :t{i})")
+            rows = session.execute(text(
+                "SELECT p.id, p.record_id, p.level, r.job_title, p.question, p.answer, 0 AS score "
+                "FROM interview_qa_pairs p JOIN interview_questions r ON r.id = p.record_id "
+                f"WHERE {' AND '.join(clauses)}{level_sql} ORDER BY p.id DESC LIMIT :limit"
+            ), params).all()
+        return [
+            self._result(row, make_snippet(row.question, terms), make_snippet(row.answer, terms))
+            for row in rows
+        ]
+
+    @staticmethod
+    def _result(row, question: str, answer: str) -> dict:
+        return {
+            "record_id": row.record_id,
+            "pair_id": row.id,
+            "level": row.level,
+            "job_title": row.job_title,
+            "question": question,
+            "answer": answer,
+            "score": round(float(row.score or 0), 6),
+        }
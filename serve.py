@@ -0,0 +1,163 @@
+"""Production server entry point: `python serve.py`.
+
+`python app.py` runs Flask's development server (with the debugger whenever
+FLASK_ENV is `development`, the default); use this module in production instead.
+
+- gunicorn (Linux/macOS): WEB_WORKERS processes of the `gthread` worker, each
+  with WEB_THREADS threads. A thread per in-flight request suits /agent, which
+  mostly waits on Gemini. The app is created once in the master (`preload_app`)
+  and forked, so imports and `create_app()` are paid once. After the fork each
+  worker drops the inherited DB connections and builds its own Gemini client.
+  SIGTERM stops accepting connections and gives in-flight requests
+  WEB_GRACEFUL_TIMEOUT seconds to finish.
+- waitress (Windows, or `--server waitress`): one process with WEB_THREADS threads.
+  On shutdown it does not drain requests that are still in flight.
+
+`init_db()` (create tables, migrations) runs exactly once, in the launching
+process, before any worker starts. Rate budgets (GEMINI_RPM/TPM), the concurrency
+cap and the DB pool are per process: divide the provider quota by WEB_WORKERS, and
+size DB_POOL_SIZE to WEB_THREADS.
+
+Usage:
+    python serve.py [--bind 0.0.0.0:5000] [--workers 2] [--threads 32] [--server auto|gunicorn|waitress]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+from config import settings
+
+# Seconds kept free before gunicorn's SIGKILL for failing unfinished jobs and closing connections
+_EXIT_MARGIN = 5.0
+
+
+def _gunicorn_available() -> bool:
+    if os.name == "nt":
+        return False
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _prepare_for_fork(app) -> None:
+    """Let background work started by create_app() finish before the master forks.
+
+    A thread holding a lock at fork time would leave that lock held forever in
+    every worker.
+    """
+    similar = app.extensions.get("similarity_index")
+    if similar is not None:
+        similar.wait_loaded(timeout=60)
+
+
+def post_fork(server, worker) -> None:
+    """gunicorn hook: give the new worker its own connections."""
+    from database import engine
+
+    # close=False: the parent's sockets are left to the parent, the pool starts empty
+    engine.dispose(close=False)
+    app = server.app.wsgi()
+    app.extensions["agent_factory"].reset_after_fork()
+    # Fail the worker early (and visibly) when the database is unreachable
+    with engine.connect():
+        pass
+
+
+def worker_exit(server, worker) -> None:
+    """gunicorn hook: runs after a worker finished its in-flight requests."""
+    from database import engine
+
+    app = server.app.wsgi()
+    # Running ?async=1 jobs get up to AGENT_TIMEOUT to finish, but never past the
+    # arbiter's SIGKILL: draining requests already used part of WEB_GRACEFUL_TIMEOUT.
+    # The rest are marked failed so their pollers stop waiting.
+    timeout = settings.agent_timeout
+    kill_at = getattr(worker, "kill_deadline", None)
+    if kill_at is not None:
+        timeout = max(0.0, min(timeout, kill_at - time.monotonic() - _EXIT_MARGIN))
+    app.extensions["job_runner"].shutdown(timeout=timeout)
+    app.extensions["agent_factory"].hedger.shutdown()
+    engine.dispose()
+
+
+def serve_gunicorn(app, bind: str, workers: int, threads: int) -> None:
+    from gunicorn.app.base import BaseApplication
+    from gunicorn.workers.gthread import ThreadWorker
+
+    class Worker(ThreadWorker):
+        def handle_exit(self, sig, frame):
+            # The arbiter SIGKILLs WEB_GRACEFUL_TIMEOUT seconds after this SIGTERM
+            if self.alive:
+                self.kill_deadline = time.monotonic() + self.cfg.graceful_timeout
+            super().handle_exit(sig, frame)
+
+    class Server(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": bind,
+                "workers": max(1, workers),
+                "worker_class": Worker,
+                "threads": max(1, threads),
+                "preload_app": True,
+                "timeout": settings.web_timeout,
+                "graceful_timeout": settings.web_graceful_timeout,
+                "keepalive": 5,
+                "post_fork": post_fork,
+                "worker_exit": worker_exit,
+                "accesslog": "-",
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    Server().run()
+
+
+def serve_waitress(app, bind: str, threads: int) -> None:
+    from waitress import serve
+
+    serve(app, listen=bind, threads=max(1, threads), channel_timeout=settings.web_timeout)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bind", default=f"0.0.0.0:{settings.port}", help="HOST:PORT (default: 0.0.0.0:$PORT)")
+    parser.add_argument("--workers", type=int, default=None, help="processes, gunicorn only (default: $WEB_WORKERS)")
+    parser.add_argument("--threads", type=int, default=settings.web_threads, help="threads per process")
+    parser.add_argument("--server", choices=("auto", "gunicorn", "waitress"), default="auto")
+    args = parser.parse_args(argv)
+
+    server = args.server
+    if server == "auto":
+        server = "gunicorn" if _gunicorn_available() else "waitress"
+    if server == "gunicorn" and os.name == "nt":
+        raise SystemExit("gunicorn does not run on Windows; use --server waitress")
+
+    # Once, before any worker exists: schema creation and migrations are not
+    # safe to run concurrently from several processes
+    from database import init_db
+
+    init_db()
+
+    from app import create_app
+
+    app = create_app()
+    if server == "gunicorn":
+        _prepare_for_fork(app)
+        serve_gunicorn(app, args.bind, args.workers or settings.web_workers, args.threads)
+    else:
+        if args.workers is not None and args.workers > 1:
+            print("waitress runs a single process; --workers is ignored", file=sys.stderr)
+        serve_waitress(app, args.bind, args.threads)
+
+
+if __name__ == "__main__":
+    main()
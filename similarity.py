@@ -0,0 +1,222 @@
+"""Near-duplicate detection for /agent requests (semantic reuse of prior generations).
+
+Requests that differ from a stored record only in wording ("Senior Backend
+Engineer" vs "Sr. Backend Developer" with nearly the same description) are
+matched locally with MinHash signatures and LSH banding; no embedding service
+is involved.
+
+- Titles are compared on character trigrams, descriptions on word uni/bigrams,
+  after lower-casing and expanding common abbreviations.
+- The estimated similarity is a weighted mix of both Jaccard estimates.
+- The index is per process and in memory. It loads the most recent
+  `max_entries` records in the background at startup and then picks up rows
+  saved by other processes incrementally (at most every `refresh_interval`).
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+_PRIME = (1 << 61) - 1
+_WORD = re.compile(r"[a-z0-9+#]+")
+
+# Expanded before shingling so abbreviations and role synonyms share shingles
+_ABBREVIATIONS = {
+    "sr": "senior",
+    "snr": "senior",
+    "jr": "junior",
+    "dev": "engineer",
+    "developer": "engineer",
+    "programmer": "engineer",
+    "eng": "engineer",
+    "engr": "engineer",
+    "mgr": "manager",
+    "sw": "software",
+    "swe": "software engineer",
+    "sde": "software engineer",
+    "ml": "machine learning",
+    "js": "javascript",
+    "k8s": "kubernetes",
+}
+
+
+def _tokens(value: str) -> List[str]:
+    out: List[str] = []
+    for word in _WORD.findall((value or "").lower()):
+        out.extend(_ABBREVIATIONS.get(word, word).split())
+    return out
+
+
+def title_shingles(job_title: str) -> Set[str]:
+    """Character trigrams of the normalized title (robust to small wording changes)."""
+    text = " " + " ".join(_tokens(job_title)) + " "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def description_shingles(job_description: str) -> Set[str]:
+    """Word unigrams and bigrams of the normalized description."""
+    words = _tokens(job_description)
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+class MinHasher:
+    """MinHash signatures using universal hashing over Python's string hash.
+
+    Signatures are only comparable within one process (str hashing is salted).
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def signature(self, shingles: Set[str]) -> Tuple[int, ...]:
+        if not shingles:
+            return (_PRIME,) * self.num_perm
+        hashes = [hash(s) & 0xFFFFFFFFFFFFFFFF for s in shingles]
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms)
+
+
+def estimate_jaccard(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class SimilarityIndex:
+    """MinHash/LSH index from (job_title, job_description) to stored record ids."""
+
+    def __init__(
+        self,
+        threshold: float,
+        max_entries: int = 20000,
+        title_weight: float = 0.4,
+        num_perm: int = 64,
+        rows_per_band: int = 4,
+        refresh_interval: float = 30.0,
+    ):
+        self.threshold = threshold
+        self._max_entries = max(1, max_entries)
+        self._title_weight = title_weight
+        self._hasher = MinHasher(num_perm)
+        self._rows = rows_per_band
+        self._refresh_interval = refresh_interval
+        # record_id -> (title signature, description signature), oldest first
+        self._entries: "OrderedDict[int, Tuple[Tuple[int, ...], Tuple[int, ...]]]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[int]] = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # Highest id read by a refresh; add() of this process's own records leaves it alone,
+        # so lower ids saved meanwhile by other processes are still picked up
+        self._refreshed_id = 0
+        self._last_refresh = 0.0
+        self._loaded = False
+        self._loader: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Load recent records in a background thread; lookups miss until it finishes."""
+        self._loader = threading.Thread(target=self.refresh, name="similarity-load", daemon=True)
+        self._loader.start()
+
+    def wait_loaded(self, timeout: Optional[float] = None) -> None:
+        """Block until the initial load started by `start()` has finished (or `timeout`)."""
+        if self._loader is not None:
+            self._loader.join(timeout)
+
+    def _bands(self, title_sig, desc_sig):
+        combined = title_sig + desc_sig
+        for band, i in enumerate(range(0, len(combined), self._rows)):
+            yield band, combined[i:i + self._rows]
+
+    def add(self, record_id: int, job_title: str, job_description: str) -> None:
+        title_sig = self._hasher.signature(title_shingles(job_title))
+        desc_sig = self._hasher.signature(description_shingles(job_description))
+        with self._lock:
+            if record_id in self._entries:
+                return
+            self._entries[record_id] = (title_sig, desc_sig)
+            for key in self._bands(title_sig, desc_sig):
+                self._buckets.setdefault(key, set()).add(record_id)
+            while len(self._entries) > self._max_entries:
+                old_id, (old_title, old_desc) = self._entries.popitem(last=False)
+                for key in self._bands(old_title, old_desc):
+                    bucket = self._buckets.get(key)
+                    if bucket is not None:
+                        bucket.discard(old_id)
+                        if not bucket:
+                            del self._buckets[key]
+
+    def find(self, job_title: str, job_description: str) -> Optional[Tuple[int, float]]:
+        """Return (record_id, similarity) of the best match at or above the threshold."""
+        self._maybe_refresh()
+        title_sig = self._hasher.signature(title_shingles(job_title))
+        desc_sig = self._hasher.signature(description_shingles(job_description))
+        best: Optional[Tuple[int, float]] = None
+        with self._lock:
+            candidates: Set[int] = set()
+            for key in self._bands(title_sig, desc_sig):
+                candidates |= self._buckets.get(key, set())
+            for record_id in candidates:
+                other_title, other_desc = self._entries[record_id]
+                score = (
+                    self._title_weight * estimate_jaccard(title_sig, other_title)
+                    + (1 - self._title_weight) * estimate_jaccard(desc_sig, other_desc)
+                )
+                # Prefer the most similar, then the most recent record
+                if score >= self.threshold and (best is None or (score, record_id) > (best[1], best[0])):
+                    best = (record_id, score)
+        return best
+
+    def _maybe_refresh(self) -> None:
+        if not self._loaded or time.monotonic() - self._last_refresh < self._refresh_interval:
+            return
+        # Only one thread refreshes; the others use the index as it is
+        if self._refresh_lock.acquire(blocking=False):
+            try:
+                self._refresh_locked()
+            finally:
+                self._refresh_lock.release()
+
+    def refresh(self) -> None:
+        """Index records saved since the last refresh (initially the most recent ones)."""
+        with self._refresh_lock:
+            self._refresh_locked()
+
+    def _refresh_locked(self) -> None:
+        from database import get_session
+        from models import InterviewQuestion
+
+        try:
+            with get_session() as session:
+                query = session.query(
+                    InterviewQuestion.id, InterviewQuestion.job_title, InterviewQuestion.job_description
+                ).filter(InterviewQuestion.id > self._refreshed_id)
+                rows = query.order_by(InterviewQuestion.id.desc()).limit(self._max_entries).all()
+            for row in reversed(rows):
+                self.add(row.id, row.job_title, row.job_description)
+            if rows:
+                self._refreshed_id = max(self._refreshed_id, rows[0].id)
+        except Exception:
+            # A failed refresh only means fewer reuse opportunities
+            pass
+        self._last_refresh = time.monotonic()
+        self._loaded = True
+
+    @staticmethod
+    def load_qa(record_id: int) -> Optional[dict]:
+        """Fetch the stored Q&A of a matched record."""
+        from database import get_session
+        from models import InterviewQuestion
+
+        with get_session() as session:
+            row = session.query(InterviewQuestion.qa).filter(InterviewQuestion.id == record_id).first()
+        if row is None or not row.qa:
+            return None
+        qa = json.loads(row.qa)
+        if isinstance(qa, list):
+            qa = {"basic": qa, "intermediate": [], "expert": []}
+        return qa if isinstance(qa, dict) else None
@@ -0,0 +1,203 @@
+"""Single-flight coalescing of identical concurrent generation requests.
+
+When many users submit the same posting at once, only one request generates
+and persists a record; the others wait for it and receive that same record.
+
+- Within a process, followers wait on the leader's in-flight call.
+- Across processes, the leader holds a lease row in `generation_leases` keyed by
+  the request's cache key. Other processes poll that row until the leader
+  publishes the record id (or the lease expires or is released, in which case
+  they try to take the lease themselves).
+
+Only requests that overlap a generation are coalesced. A finished lease is kept
+for `linger` seconds so processes already polling it can read the record id,
+but a request arriving after the generation finished replaces it and runs `fn`,
+which answers repeats from the generation cache. Coordination is best effort:
+when the lease table cannot be reached, `fn` runs uncoordinated.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import delete, or_, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from agent import DeadlineExceededError
+from database import get_session
+from hedging import DEADLINES, remaining
+from models import GenerationLease
+
+
+def _utcnow() -> datetime:
+    # Lease times are stored as naive UTC so they compare the same on every backend
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _cap(seconds: float, deadline: Optional[float]) -> float:
+    """`seconds`, shortened to what is left before a time.monotonic() deadline."""
+    left = remaining(deadline)
+    return seconds if left is None else min(seconds, left)
+
+
+def _check_deadline(deadline: Optional[float]) -> None:
+    if deadline is not None and time.monotonic() >= deadline:
+        DEADLINES.inc()
+        raise DeadlineExceededError("Gemini generation timed out")
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[dict] = None
+        self.error: Optional[BaseException] = None
+
+
+class RequestCoalescer:
+    """Coalesce `run(key, fn)` calls that share a key.
+
+    load_record(record_id) must return a result shaped like `QuestionAgent.run`;
+    it is used when the record was produced by another process. Followers of an
+    in-flight call get `source: "coalesced"`. A follower waits at most until its
+    own deadline (time.monotonic()), then raises DeadlineExceededError.
+    """
+
+    def __init__(
+        self,
+        load_record: Callable[[int], Optional[dict]],
+        use_database: bool = True,
+        lease_ttl: float = 120.0,
+        linger: float = 5.0,
+        poll_interval: float = 0.25,
+    ):
+        self._load_record = load_record
+        self._use_database = use_database
+        self._lease_ttl = lease_ttl
+        self._linger = linger
+        self._poll = poll_interval
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._acquisitions = 0
+
+    def run(self, key: str, fn: Callable[[], dict], deadline: Optional[float] = None) -> dict:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            # Bounded wait: a stuck leader must not hang followers forever
+            if call.done.wait(timeout=_cap(self._lease_ttl, deadline)) and call.result is not None:
+                return dict(call.result, source="coalesced")
+            if call.error is not None:
+                raise call.error
+            _check_deadline(deadline)
+            return fn()
+
+        try:
+            call.result = self._run_leased(key, fn, deadline) if self._use_database else fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def _run_leased(self, key: str, fn: Callable[[], dict], request_deadline: Optional[float] = None) -> dict:
+        owner = uuid.uuid4().hex
+        deadline = time.monotonic() + _cap(self._lease_ttl, request_deadline)
+        while True:
+            try:
+                acquired = self._try_acquire(key, owner)
+            except SQLAlchemyError:
+                # Coordination is best effort: never fail a request because of it
+                return fn()
+            if acquired:
+                try:
+                    result = fn()
+                except BaseException:
+                    self._release(key, owner)
+                    raise
+                self._complete(key, owner, result["id"])
+                return result
+            try:
+                result = self._wait_for_other(key, deadline)
+            except SQLAlchemyError:
+                return fn()
+            if result is not None:
+                return result
+            if time.monotonic() >= deadline:
+                _check_deadline(request_deadline)
+                return fn()
+
+    def _try_acquire(self, key: str, owner: str) -> bool:
+        """Take the lease; False while another generation holds it.
+
+        A finished lease (record published) belongs to no in-flight generation,
+        so it is replaced like an expired one.
+        """
+        now = _utcnow()
+        try:
+            with get_session() as session:
+                session.execute(
+                    delete(GenerationLease).where(
+                        GenerationLease.key == key,
+                        or_(GenerationLease.expires_at < now, GenerationLease.record_id.is_not(None)),
+                    )
+                )
+                self._acquisitions += 1
+                if self._acquisitions % 100 == 0:
+                    # Occasional sweep of finished leases for other keys
+                    session.execute(delete(GenerationLease).where(GenerationLease.expires_at < now))
+                session.add(GenerationLease(
+                    key=key,
+                    owner=owner,
+                    expires_at=now + timedelta(seconds=self._lease_ttl),
+                ))
+            return True
+        except IntegrityError:
+            return False
+
+    def _complete(self, key: str, owner: str, record_id: int) -> None:
+        """Publish the record id; kept briefly for processes already polling the lease."""
+        try:
+            with get_session() as session:
+                session.execute(
+                    update(GenerationLease)
+                    .where(GenerationLease.key == key, GenerationLease.owner == owner)
+                    .values(record_id=record_id, expires_at=_utcnow() + timedelta(seconds=self._linger))
+                )
+        except Exception:
+            pass
+
+    def _release(self, key: str, owner: str) -> None:
+        try:
+            with get_session() as session:
+                session.execute(
+                    delete(GenerationLease).where(GenerationLease.key == key, GenerationLease.owner == owner)
+                )
+        except Exception:
+            pass
+
+    def _wait_for_other(self, key: str, deadline: float) -> Optional[dict]:
+        """Poll another process's lease; None means it is gone and we may retry."""
+        while time.monotonic() < deadline:
+            with get_session() as session:
+                lease = session.get(GenerationLease, key)
+                record_id = lease.record_id if lease is not None else None
+                expired = lease is None or lease.expires_at < _utcnow()
+            if record_id is not None:
+                result = self._load_record(record_id)
+                if result is not None:
+                    return dict(result, source="coalesced")
+            if expired:
+                return None
+            time.sleep(min(self._poll, max(0.0, deadline - time.monotonic())))
+        return None
@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from agent import AIUnavailableError, QuestionAgent, generation_cache_key
+from cache import GenerationCache, MemoryCacheBackend
+
+DOC = {
+    "basic": [{"question": "q1", "answer": "a1"}],
+    "intermediate": [{"question": "q2", "answer": "a2"}],
+    "expert": [{"question": "q3", "answer": "a3"}],
+}
+
+
+class StreamBackend:
+    def __init__(self, text, chunk=5):
+        self._chunks = [text[i:i + chunk] for i in range(0, len(text), chunk)]
+
+    def stream(self, model, prompt):
+        yield from self._chunks
+
+
+def _agent(text):
+    saved = []
+
+    def save(job_title, job_description, questions, qa, cache_key=None):
+        saved.append(qa)
+        return {"id": len(saved), "created_at": None, "qa": qa}
+
+    cache = GenerationCache(MemoryCacheBackend())
+    return QuestionAgent(save, cache=cache, backend=StreamBackend(text)), saved, cache
+
+
+def test_truncated_stream_is_not_saved_or_cached():
+    text = json.dumps(DOC)
+    agent, saved, cache = _agent(text[: text.index('"expert"')])
+    events = []
+    with pytest.raises(AIUnavailableError, match="truncated"):
+        for event in agent.run_stream("Backend Engineer", "Python"):
+            events.append(event)
+    assert [kind for kind, _ in events] == ["qa", "qa"]
+    assert saved == []
+    # The single-mode key is the one POST /agent reads in the default mode
+    assert cache.get(generation_cache_key("Backend Engineer", "Python", mode="single")) is None
+
+
+def test_complete_stream_is_saved():
+    agent, saved, _ = _agent("Here you go:\n" + json.dumps(DOC))
+    events = list(agent.run_stream("Backend Engineer", "Python"))
+    assert [kind for kind, _ in events] == ["qa", "qa", "qa", "record"]
+    assert saved == [DOC]
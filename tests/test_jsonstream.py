@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from jsonstream import IncrementalQAParser, extract_json
+
+DOC = {
+    "basic": [{"question": "q1", "answer": "a1"}, {"question": "q2", "answer": "a2"}],
+    "intermediate": [{"question": "q3", "answer": "a3"}],
+    "expert": [{"question": "q4", "answer": "a4"}],
+}
+
+
+def _stream(text, step):
+    parser = IncrementalQAParser()
+    pairs = []
+    for i in range(0, len(text), step):
+        pairs += parser.feed(text[i:i + step])
+    return pairs, parser.done
+
+
+def _expected():
+    return [(level, item) for level in ("basic", "intermediate", "expert") for item in DOC[level]]
+
+
+@pytest.mark.parametrize("step", [1, 2, 7, 10_000])
+def test_parser_skips_braces_in_leading_prose(step):
+    text = "Template {role} below: [1] " + json.dumps(DOC)
+    assert _stream(text, step) == (_expected(), True)
+
+
+@pytest.mark.parametrize("step", [1, 10_000])
+def test_parser_skips_code_fence(step):
+    text = "```json\n" + json.dumps(DOC, indent=2) + "\n```"
+    assert _stream(text, step) == (_expected(), True)
+
+
+def test_parser_treats_bare_array_as_basic():
+    pairs, done = _stream('[ {"question": "q", "answer": "a"}]', 1)
+    assert pairs == [("basic", {"question": "q", "answer": "a"})]
+    assert done
+
+
+def test_parser_truncated_document_is_not_done():
+    text = json.dumps(DOC)
+    pairs, done = _stream(text[: text.index('"expert"')], 3)
+    assert len(pairs) == 3
+    assert not done
+
+
+@pytest.mark.parametrize("prefix", [
+    'Use {" as the opener: ',
+    'Keys look like {"basic" or {"expert", e.g. ',
+    'Example: {"note": "see {" then ',
+    'Arrays [{" start like this: ',
+])
+def test_extract_json_finds_document_swallowed_by_bogus_string(prefix):
+    assert extract_json(prefix + json.dumps(DOC)) == DOC
+
+
+@pytest.mark.parametrize("text", [
+    json.dumps(DOC),
+    "Sure! Here it is:\n```json\n" + json.dumps(DOC, indent=2) + "\n```\nGood luck {name}!",
+    "Template {role} below: " + json.dumps(DOC) + " trailing } junk ]",
+])
+def test_extract_json_ignores_prose_fences_and_trailing_junk(text):
+    assert extract_json(text) == DOC
+
+
+def test_extract_json_returns_bare_array():
+    assert extract_json('Here: [{"question": "q", "answer": "a"}] done') == [{"question": "q", "answer": "a"}]
+
+
+@pytest.mark.parametrize("text", [
+    json.dumps(DOC)[:-40],
+    "no json here {role} [1]",
+])
+def test_extract_json_rejects_truncated_or_missing_document(text):
+    with pytest.raises(ValueError):
+        extract_json(text)
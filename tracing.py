@@ -0,0 +1,255 @@
+"""Request tracing: nested spans per Flask request, slow-request logs, OTLP file export.
+
+`Tracer.install(app)` opens a root span for every request. Code on the request
+path wraps its stages in `span("name")`; spans nest through a context variable,
+so no span object has to be passed around. Outside a traced request `span()` is
+a no-op costing one context-variable lookup.
+
+When a request finishes:
+- if it took longer than TRACE_SLOW_MS, its span tree is logged as one JSON
+  line on the `interview_agent.trace` logger (WARNING);
+- if TRACE_EXPORT_PATH is set, its spans are appended to that file as one OTLP
+  JSON `ExportTraceServiceRequest` per line (the OpenTelemetry collector's
+  file exporter format), readable by `otelcol` file receivers and most trace viewers.
+
+Work handed to other threads (hedged calls, per-level prompts) keeps its parent
+span when the callable is wrapped with `bind()`; the body of a streamed response
+is traced when wrapped with `bind_iter()`, and the request span then ends when
+the response is closed.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+logger = logging.getLogger("interview_agent.trace")
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent", "start_ns", "end_ns", "attributes", "children", "error")
+
+    def __init__(self, name: str, trace_id: str, parent: Optional["Span"] = None, attributes: Optional[dict] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent = parent
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, object] = dict(attributes or {})
+        self.children: List[Span] = []
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def tree(self) -> dict:
+        """Nested dict for the slow-request log."""
+        node = {"name": self.name, "ms": round(self.duration_ms, 3)}
+        if self.attributes:
+            node["attributes"] = self.attributes
+        if self.error:
+            node["error"] = self.error
+        if self.children:
+            node["children"] = [child.tree() for child in list(self.children)]
+        return node
+
+    def walk(self) -> Iterator["Span"]:
+        yield self
+        for child in list(self.children):
+            yield from child.walk()
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """Record a child of the current span; does nothing outside a traced request."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, parent.trace_id, parent, attributes)
+    # list.append is atomic, so spans from worker threads can join the same parent
+    parent.children.append(child)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.end_ns = time.time_ns()
+        _current.reset(token)
+
+
+def bind(fn: Callable[..., T]) -> Callable[..., T]:
+    """Run `fn` (e.g. in a pool thread) under the span that is current now."""
+    if _current.get() is None:
+        return fn
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A copy per call: one Context cannot be entered by two threads at once
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+def bind_iter(iterable: Iterable[T]) -> Iterator[T]:
+    """Iterate `iterable` under the span that is current now (for streamed responses,
+    whose body is produced after the view has returned)."""
+    if _current.get() is None:
+        return iter(iterable)
+    context = contextvars.copy_context()
+
+    def run():
+        it = iter(iterable)
+        while True:
+            try:
+                item = context.run(next, it)
+            except StopIteration:
+                return
+            yield item
+
+    return run()
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPFileExporter:
+    """Append finished traces to a file as OTLP/JSON lines."""
+
+    def __init__(self, path: str, service_name: str = "interview-agent"):
+        self.path = path
+        self._resource = {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]}
+        self._lock = threading.Lock()
+
+    def _span(self, s: Span) -> dict:
+        out = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            # SERVER for the request span, INTERNAL below it
+            "kind": 2 if s.parent is None else 1,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns if s.end_ns is not None else s.start_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+            "status": {"code": 2, "message": s.error} if s.error else {},
+        }
+        if s.parent is not None:
+            out["parentSpanId"] = s.parent.span_id
+        return out
+
+    def export(self, root: Span) -> None:
+        line = json.dumps({
+            "resourceSpans": [{
+                "resource": self._resource,
+                "scopeSpans": [{"scope": {"name": "interview_agent"}, "spans": [self._span(s) for s in root.walk()]}],
+            }]
+        }, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(line + "\n")
+
+
+class Tracer:
+    def __init__(self, slow_ms: float = 0, exporter: Optional[OTLPFileExporter] = None):
+        self.slow_ms = slow_ms
+        self.exporter = exporter
+
+    @classmethod
+    def from_settings(cls, settings) -> "Tracer":
+        exporter = OTLPFileExporter(settings.trace_export_path) if settings.trace_export_path else None
+        return cls(slow_ms=settings.trace_slow_ms, exporter=exporter)
+
+    @property
+    def enabled(self) -> bool:
+        return self.slow_ms > 0 or self.exporter is not None
+
+    def start(self, name: str, **attributes) -> Tuple[Span, contextvars.Token]:
+        """Open a root span and make it current; pass both to `finish`."""
+        root = Span(name, os.urandom(16).hex(), None, attributes)
+        return root, _current.set(root)
+
+    def finish(
+        self, root: Span, token: Optional[contextvars.Token] = None, error: Optional[BaseException] = None
+    ) -> Span:
+        """Close a root span, log it when slow and export it. Pass the token from
+        `start` when still in the request's context."""
+        if token is not None:
+            _current.reset(token)
+        root.end_ns = time.time_ns()
+        if error is not None:
+            root.error = f"{type(error).__name__}: {error}"
+        if self.slow_ms > 0 and root.duration_ms >= self.slow_ms:
+            logger.warning(json.dumps(
+                {"event": "slow_request", "trace_id": root.trace_id, "duration_ms": round(root.duration_ms, 3),
+                 "threshold_ms": self.slow_ms, "spans": root.tree()},
+                default=str,
+            ))
+        if self.exporter is not None:
+            try:
+                self.exporter.export(root)
+            except OSError:
+                # Tracing must never fail a request
+                pass
+        return root
+
+    def install(self, app) -> None:
+        """Trace every request of a Flask app (no hooks are added when disabled)."""
+        if not self.enabled:
+            return
+        from flask import g, request
+
+        @app.before_request
+        def _trace_start():
+            g._trace = self.start(
+                f"{request.method} {request.url_rule or request.path}",
+                **{"http.method": request.method, "http.target": request.full_path.rstrip("?")},
+            )
+
+        @app.after_request
+        def _trace_status(response):
+            trace = g.get("_trace")
+            if trace is not None:
+                trace[0].set(**{"http.status_code": response.status_code})
+                if response.is_streamed:
+                    # The body is produced after teardown; close the trace with the response
+                    g._trace_streamed = True
+                    response.call_on_close(lambda: self.finish(trace[0]))
+            return response
+
+        @app.teardown_request
+        def _trace_finish(error=None):
+            trace = g.pop("_trace", None)
+            if trace is None:
+                return
+            if g.pop("_trace_streamed", False):
+                _current.reset(trace[1])
+            else:
+                self.finish(*trace, error)